@@ -0,0 +1,214 @@
+# server/load_test.py
+"""
+Concurrent-session load test for the MoneyTron backend.
+
+Starts server/new_app.py under Waitress with a throw-away MONEYTRON_DATA_DIR
+(or targets --url), then runs N simulated sessions in parallel, each looping
+over a realistic flow:
+
+    login -> bootstrap -> staging edits (POST /api/current-month) x K
+          -> commit (POST /api/transactions) -> statistics
+
+and reports throughput, per-endpoint latency percentiles, errors and the time
+requests spent waiting on the server's global write lock (from /api/health).
+
+    python server/load_test.py --sessions 8 --duration 30
+    MONEYTRON_THREADS=8 python server/load_test.py --sessions 16 --seed-rows 5000
+
+Note: the server keeps one active user per process (POST /api/login), so
+concurrent sessions with different users overwrite each other's login; the
+flows still exercise the same reads, writes and locks.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+SERVER = Path(__file__).resolve().parent / "new_app.py"
+VENDORS = [("wolt", "אוכל", "wolt"), ("ארומה", "אוכל", "קפה"), ("שופרסל", "סופר", "סופר גדול"),
+           ("FreeTv", "דירה", "FreeTv"), ("חברת חשמל", "דירה", "חשמל"), ("סינמה סיטי", "חוויות", "קולנוע")]
+
+
+def _rows(n: int, start_id: int, year: int, month: int):
+    out = []
+    for i in range(n):
+        name, cat, sub = random.choice(VENDORS)
+        day = random.randint(1, 28)
+        iso = f"{year}-{month:02d}-{day:02d}"
+        out.append({
+            "id": f"lt-{start_id + i}", "date": iso, "date_iso": iso, "date_str": f"{day:02d}-{month:02d}-{year}",
+            "year": year, "month_tag": month, "tag": month, "name": name,
+            "amount": round(random.uniform(10, 600), 2), "debit": round(random.uniform(10, 600), 2),
+            "currency": "ILS", "type": "Expense", "category": cat, "subcategory": sub,
+        })
+    return out
+
+
+def _seed(data_dir: Path, users, rows_per_user: int) -> None:
+    for u in users:
+        udir = data_dir / u
+        udir.mkdir(parents=True, exist_ok=True)
+        past = []
+        for k in range(rows_per_user):
+            month = k % 24
+            past.extend(_rows(1, k, 2024 + month // 12, month % 12 + 1))
+        (udir / "past_data.json").write_text(json.dumps(past, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lat = {}          # op -> [seconds]
+        self.errors = {}       # op -> count
+
+    def record(self, op: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.lat.setdefault(op, []).append(seconds)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+
+def _call(base: str, stats: Stats, op: str, path: str, body=None):
+    data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"})
+    t = time.perf_counter()
+    ok = True
+    try:
+        with urllib.request.urlopen(req, timeout=60) as r:
+            payload = r.read()
+    except (urllib.error.URLError, OSError):
+        ok, payload = False, b""
+    stats.record(op, time.perf_counter() - t, ok)
+    return payload
+
+
+def _session(base: str, user: str, stats: Stats, stop: threading.Event, edits: int, rows: int, seq):
+    while not stop.is_set():
+        _call(base, stats, "login", "/api/login", {"user": user})
+        _call(base, stats, "bootstrap", "/api/bootstrap")
+        staged = []
+        for _ in range(edits):
+            staged.extend(_rows(rows, seq() * rows, 2025, random.randint(1, 12)))
+            _call(base, stats, "stage", "/api/current-month", {"transactions": staged})
+        _call(base, stats, "commit", "/api/transactions", {"transactions": staged})
+        _call(base, stats, "statistics", "/api/statistics",
+              {"years": [], "tagsByYear": {}, "type": "Expense", "quickFilter": "last6"})
+
+
+def _pct(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _health(base: str):
+    try:
+        with urllib.request.urlopen(base + "/api/health", timeout=2) as r:
+            return json.loads(r.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="target a running server instead of starting one")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--users", type=int, default=3, help="distinct household users")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds")
+    ap.add_argument("--edits", type=int, default=3, help="staging saves per flow")
+    ap.add_argument("--rows", type=int, default=5, help="rows added per staging save")
+    ap.add_argument("--seed-rows", type=int, default=1000, help="past_data rows per user before the run")
+    ap.add_argument("--keep-data", action="store_true", help="don't delete the temporary data dir")
+    args = ap.parse_args(argv)
+
+    users = [f"load{i}" for i in range(args.users)]
+    proc = data_dir = None
+    base = (args.url or "").rstrip("/")
+    if not base:
+        data_dir = Path(tempfile.mkdtemp(prefix="moneytron-load-"))
+        _seed(data_dir, users, args.seed_rows)
+        port = _free_port()
+        env = dict(os.environ, PORT=str(port), MONEYTRON_DATA_DIR=str(data_dir),
+                   MONEYTRON_LOG_LEVEL=os.environ.get("MONEYTRON_LOG_LEVEL", "WARNING"))
+        proc = subprocess.Popen([sys.executable, str(SERVER)], cwd=str(data_dir), env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base = f"http://127.0.0.1:{port}"
+        for _ in range(300):
+            if _health(base) is not None:
+                break
+            time.sleep(0.1)
+        else:
+            proc.kill()
+            print("[Error] server did not come up")
+            return 1
+
+    try:
+        before = _health(base) or {}
+        stats, stop = Stats(), threading.Event()
+        counter = iter(range(10 ** 12))
+        seq_lock = threading.Lock()
+
+        def seq():
+            with seq_lock:
+                return next(counter)
+
+        threads = [
+            threading.Thread(target=_session, daemon=True,
+                             args=(base, users[i % len(users)], stats, stop, args.edits, args.rows, seq))
+            for i in range(args.sessions)
+        ]
+        print(f"[Load ] {args.sessions} sessions x {args.duration:.0f}s against {base} "
+              f"(threads={os.environ.get('MONEYTRON_THREADS', 'default')})")
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+        after = _health(base) or {}
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if data_dir is not None and not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    everything = [x for v in stats.lat.values() for x in v]
+    print(f"[Total] {len(everything)} requests in {elapsed:.1f}s = {len(everything) / elapsed:.1f} req/s, "
+          f"errors {sum(stats.errors.values())}")
+    print(f"{'endpoint':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for op, v in sorted(stats.lat.items()) + [("ALL", everything)]:
+        if not v:
+            continue
+        print(f"{op:<12}{len(v):>8}{_pct(v, 50) * 1000:>10.1f}{_pct(v, 95) * 1000:>10.1f}"
+              f"{_pct(v, 99) * 1000:>10.1f}{max(v) * 1000:>10.1f}{stats.errors.get(op, 0):>8}")
+    lb, la = before.get("lock"), after.get("lock")
+    if lb and la:
+        print(f"[Lock ] acquisitions {la['acquired'] - lb['acquired']:.0f}, "
+              f"contended {la['contended'] - lb['contended']:.0f}, "
+              f"total wait {la['wait_ms'] - lb['wait_ms']:.1f} ms, max wait {la['max_wait_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# server/measure_startup.py
+"""
+Measure MoneyTron launch latency: time from spawning the process until
+/api/health answers. Works for the packaged executable (PyInstaller one-file
+unpacking included) and for the source tree.
+
+    python server/measure_startup.py                 # ./MoneyTron(.exe) if present, else server/new_app.py
+    python server/measure_startup.py --runs 5 --cmd ./MoneyTron
+    python server/measure_startup.py --warmup sync   # compare startup modes
+"""
+import argparse
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _default_cmd():
+    for exe in ("MoneyTron.exe", "MoneyTron"):
+        if (ROOT_DIR / exe).is_file():
+            return [str(ROOT_DIR / exe)]
+    return [sys.executable, str(ROOT_DIR / "server" / "new_app.py")]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _probe(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=0.5) as r:
+            return json.loads(r.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def measure_once(cmd, data_dir, warmup: str, timeout: float):
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), MONEYTRON_WARMUP=warmup)
+    if data_dir:
+        env["MONEYTRON_DATA_DIR"] = data_dir
+    url = f"http://127.0.0.1:{port}/api/health"
+    with tempfile.TemporaryDirectory() as cwd:       # keep moneytron.log out of the tree
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            ready = warm = None
+            while time.perf_counter() - t0 < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"process exited with code {proc.returncode}")
+                health = _probe(url)
+                if health is not None:
+                    if ready is None:
+                        ready = time.perf_counter() - t0
+                    if health.get("warmup") in ("done", "off", None):
+                        warm = time.perf_counter() - t0
+                        break
+                time.sleep(0.02)
+            if ready is None:
+                raise RuntimeError(f"no response within {timeout:.0f}s")
+            return ready, warm
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cmd", help="command to launch (default: packaged executable or new_app.py)")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--warmup", default="background", choices=["background", "sync", "off"])
+    ap.add_argument("--data-dir", help="MONEYTRON_DATA_DIR for the launched app (default: app's own users/)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args(argv)
+
+    cmd = shlex.split(args.cmd) if args.cmd else _default_cmd()
+    print(f"[Measure] {' '.join(cmd)}  (warm-up: {args.warmup}, runs: {args.runs})")
+    ready_s, warm_s = [], []
+    for i in range(args.runs):
+        ready, warm = measure_once(cmd, args.data_dir, args.warmup, args.timeout)
+        ready_s.append(ready)
+        if warm is not None:
+            warm_s.append(warm)
+        print(f"[Run {i + 1}] first response {ready * 1000:.0f} ms"
+              + (f", caches warm {warm * 1000:.0f} ms" if warm is not None else ""))
+    print(f"[Result] first response: median {statistics.median(ready_s) * 1000:.0f} ms, "
+          f"min {min(ready_s) * 1000:.0f} ms, max {max(ready_s) * 1000:.0f} ms")
+    if warm_s:
+        print(f"[Result] caches warm:    median {statistics.median(warm_s) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
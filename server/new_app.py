@@ -2,14 +2,28 @@
 import os
 import sys
 import json
+import re
+import csv
+import io
 import tempfile
+import zipfile
+import hashlib
+import math
+import time
 from pathlib import Path
-from typing import Any, Dict
-from threading import RLock
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from threading import RLock, Thread
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from collections import Counter
+from bisect import bisect_left, insort
+from xml.sax.saxutils import escape as _xml_escape
 import logging
+from dataclasses import dataclass, field
 
-from flask import Flask, request, jsonify, send_from_directory, abort, make_response
+_T0 = time.perf_counter()        # before Flask import; the entrypoint reports time-to-serve from here
+
+from flask import Flask, Response, request, jsonify, send_from_directory, abort, make_response, stream_with_context
 
 # =============================================================================
 # Paths that work in BOTH dev and PyInstaller -- with PERSISTENT users/
@@ -29,10 +43,6 @@ else:
     CLIENT_DIR = (ROOT_DIR / "client").resolve()
     USERS_DIR  = (ROOT_DIR / "users").resolve()
 
-# right after CLIENT_DIR is computed
-print(f"[MoneyTron] Serving client from: {CLIENT_DIR}")
-print(f"[MoneyTron] Data dir: {USERS_DIR}")
-
 # Optional override via env (handy for Docker or custom paths)
 USERS_DIR = Path(os.environ.get("MONEYTRON_DATA_DIR", USERS_DIR)).resolve()
 USERS_DIR.mkdir(parents=True, exist_ok=True)
@@ -43,10 +53,10 @@ USERS_DIR.mkdir(parents=True, exist_ok=True)
 app = Flask(__name__, static_folder=None)
 log_path = "moneytron.log"
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=getattr(logging, os.environ.get("MONEYTRON_LOG_LEVEL", "DEBUG").upper(), logging.DEBUG),
     format='[%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(log_path, mode='a'),
+        logging.FileHandler(log_path, mode='a', delay=True),     # opened on first record, not at import
         logging.StreamHandler()
     ]
 )
@@ -69,7 +79,36 @@ def _short_opts():
     if request.method == "OPTIONS":
         return ("", 200)
 
-_glock = RLock()
+class _TimedRLock:
+    """RLock that accounts how long callers waited for it (see /api/health)."""
+
+    def __init__(self):
+        self._lock = RLock()
+        self.stats = {"acquired": 0, "contended": 0, "wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def acquire(self) -> bool:
+        if self._lock.acquire(blocking=False):
+            self.stats["acquired"] += 1
+            return True
+        t = time.perf_counter()
+        self._lock.acquire()
+        waited = (time.perf_counter() - t) * 1000
+        st = self.stats                     # updated while holding the lock
+        st["acquired"] += 1
+        st["contended"] += 1
+        st["wait_ms"] += waited
+        st["max_wait_ms"] = max(st["max_wait_ms"], waited)
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
+
+_glock = _TimedRLock()
 _CURRENT_USER = {"name": None}
 
 # =============================================================================
@@ -99,6 +138,9 @@ def _paths(username: str) -> Dict[str, Path]:
         "stage":      (udir / "current_month_transactions.json"),
         "past":       (udir / "past_data.json"),
         "settings":   (udir / "settings.json"),
+        "budgets":    (udir / "budgets.json"),
+        "rates":      (udir / "rates.csv"),         # optional, user-supplied
+        "rules":      (udir / "rules.json"),
     }
 
 def _read_json(path: Path, default: Any) -> Any:
@@ -111,17 +153,26 @@ def _read_json(path: Path, default: Any) -> Any:
         return default
 
 def _atomic_write(path: Path, data: Any) -> None:
+    _atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+def _atomic_write_text(path: Path, text: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with _glock:
         with tempfile.NamedTemporaryFile("w", delete=False, dir=str(path.parent), encoding="utf-8") as tmp:
-            json.dump(data, tmp, ensure_ascii=False, indent=2)
+            tmp.write(text)
             tmp.flush()
             os.fsync(tmp.fileno())
             tmppath = Path(tmp.name)
         tmppath.replace(path)
 
+# Users whose files were already checked/created by this process; later calls
+# skip the per-file exists() probes.
+_PROVISIONED: set = set()
+
 def _ensure_user_files(username: str) -> Dict[str, Path]:
     p = _paths(username)
+    if username in _PROVISIONED:
+        return p
     defaults = {
         "categories": {},                                   # { "Food": ["Groceries","Dining"], ... }
         "stage": [],                                        # staging rows (Transactions tab)
@@ -131,13 +182,962 @@ def _ensure_user_files(username: str) -> Dict[str, Path]:
             "currency": "ILS",
             "allowedCurrencies": ["ILS", "USD"]
         },
+        "budgets": {},                                      # { "Food": {"limit": 3000, "subcategories": {"wolt": 500}} }
+        "rules": [],                                        # recategorization rules (see /api/rules)
     }
     if not p["categories"].exists(): _atomic_write(p["categories"], defaults["categories"])
     if not p["stage"].exists():      _atomic_write(p["stage"],      defaults["stage"])
     if not p["past"].exists():       _atomic_write(p["past"],       defaults["past"])
     if not p["settings"].exists():   _atomic_write(p["settings"],   defaults["settings"])
+    if not p["budgets"].exists():    _atomic_write(p["budgets"],    defaults["budgets"])
+    if not p["rules"].exists():      _atomic_write(p["rules"],      defaults["rules"])
+    if _needs_migration(p["stage"]) or _needs_migration(p["past"]):
+        _snapshot(username, p, "row format migration")
+        _migrate_rows(p["stage"], draft=True)              # staging may hold half-typed dates
+        _migrate_rows(p["past"])
+    _PROVISIONED.add(username)
     return p
 
+# =============================================================================
+# Transaction model: rows are validated and normalized once, at write time
+# =============================================================================
+# Stored (canonical) rows always have "date" (ISO or ""), int "year" and
+# "month_tag" (or None), float "debit", and string currency/type/category/
+# subcategory/name. The redundant client fields (date_iso, date_str, tag, and
+# amount when it equals debit) are dropped on disk and re-added by
+# _client_rows() for the browser, so readers never coerce per request.
+_TX_TYPES = ("Expense", "Income")
+_TX_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y")
+_TX_DERIVED = ("date_iso", "date_str", "tag")
+
+def _parse_tx_date(raw: Any) -> Optional[datetime]:
+    s = str(raw or "").strip()[:10]
+    for fmt in _TX_DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _opt_int(v: Any) -> Optional[int]:
+    return None if v in (None, "") else int(float(v))
+
+@dataclass(slots=True)
+class Transaction:
+    id: Any = None
+    date: str = ""
+    year: Optional[int] = None
+    month_tag: Optional[int] = None
+    name: str = ""
+    debit: float = 0.0
+    amount: Optional[float] = None          # kept only when it differs from debit
+    currency: str = "ILS"
+    type: str = "Expense"
+    category: str = ""
+    subcategory: str = ""
+    notes: str = ""
+    extra: Dict[str, Any] = field(default_factory=dict)   # client-only keys (vi, manual, __credit, ...)
+
+    _KNOWN = ("id", "date", "year", "month_tag", "name", "debit", "amount", "currency",
+              "type", "category", "subcategory", "notes") + _TX_DERIVED
+
+    @classmethod
+    def from_row(cls, row: Any, draft: bool = False) -> "Transaction":
+        """Validate a client/legacy row; raises ValueError with a readable reason.
+        With draft (staging autosave), an unreadable date is stored as "" and the
+        typed text is kept in "date_input" instead of failing the row."""
+        if not isinstance(row, dict):
+            raise ValueError("must be an object")
+        raw_date = row.get("date") or row.get("date_iso") or row.get("date_str")
+        d = _parse_tx_date(raw_date)
+        if raw_date and d is None and not draft:
+            raise ValueError(f"unreadable date {raw_date!r}")
+        try:
+            # debit is what the client totals read; 0 is a real value, so fall
+            # back to amount only when debit is absent.
+            raw_debit = row.get("debit")
+            if raw_debit in (None, ""):
+                raw_debit = row.get("amount") or 0
+            debit = float(raw_debit)
+            amount = float(row["amount"]) if row.get("amount") not in (None, "") else None
+            tag = _opt_int(row.get("month_tag") or row.get("tag"))
+            # Statement rows are filed under the year the user picked, which can
+            # differ from the purchase date (Dec purchase on a Jan statement).
+            year = _opt_int(row.get("year"))
+            if year is None and d:
+                year = d.year
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError("debit/amount/year/month_tag must be numbers")
+        if not math.isfinite(debit) or (amount is not None and not math.isfinite(amount)):
+            raise ValueError("debit/amount must be finite numbers")     # NaN/Infinity break JSON.parse
+        tx_type = row.get("type") or "Expense"
+        if tx_type not in _TX_TYPES:
+            raise ValueError(f"type must be one of {', '.join(_TX_TYPES)}")
+        return cls(
+            id=row.get("id"),
+            date=d.strftime("%Y-%m-%d") if d else "",
+            year=year,
+            month_tag=tag if tag is not None else (d.month if d else None),
+            name=str(row.get("name") or "").strip(),
+            debit=debit,
+            amount=None if amount is None or amount == debit else amount,
+            currency=str(row.get("currency") or "ILS").upper(),
+            type=tx_type,
+            category=str(row.get("category") or ""),
+            subcategory=str(row.get("subcategory") or ""),
+            notes=str(row.get("notes") or ""),
+            extra={k: v for k, v in row.items() if k not in cls._KNOWN and k != "date_input"}
+                  | ({"date_input": str(raw_date)} if raw_date and d is None else {}),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Compact canonical form written to disk."""
+        out = {
+            "id": self.id, "date": self.date, "year": self.year, "month_tag": self.month_tag,
+            "name": self.name, "debit": self.debit, "currency": self.currency, "type": self.type,
+            "category": self.category, "subcategory": self.subcategory,
+        }
+        if self.amount is not None:
+            out["amount"] = self.amount
+        if self.notes:
+            out["notes"] = self.notes
+        out.update(self.extra)
+        return out
+
+def _normalize_rows(rows: Any, what: str, draft: bool = False) -> List[Dict[str, Any]]:
+    """Validate a list posted by the client into canonical rows (400 on bad input).
+    draft is for the staging autosave, see Transaction.from_row."""
+    if not isinstance(rows, list):
+        abort(400, description=f"'{what}' must be a list")
+    out = []
+    for i, row in enumerate(rows):
+        try:
+            out.append(Transaction.from_row(row, draft).to_row())
+        except ValueError as e:
+            abort(400, description=f"'{what}' row {i}: {e}")
+    return out
+
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _is_int(v: Any) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool)
+
+def _is_finite(v: Any) -> bool:
+    return _is_int(v) or (isinstance(v, float) and math.isfinite(v))
+
+def _is_canonical(row: Any) -> bool:
+    """True if row already has the stored shape and types the readers rely on."""
+    if not isinstance(row, dict) or "year" not in row or "month_tag" not in row:
+        return False
+    if any(k in row for k in _TX_DERIVED):
+        return False
+    date, year, tag, debit = row.get("date"), row["year"], row["month_tag"], row.get("debit")
+    return (isinstance(date, str) and (date == "" or bool(_ISO_DATE.fullmatch(date)))
+            and (year is None or _is_int(year)) and (tag is None or _is_int(tag))
+            and _is_finite(debit) and ("amount" not in row or _is_finite(row["amount"]))
+            and row.get("type") in _TX_TYPES)
+
+def _quarantine_row(row: Any, reason: str) -> Dict[str, Any]:
+    """Canonical stand-in for a stored row that fails validation: no date, no
+    month and a zero debit, so no reader counts it. The original row is kept
+    under "_invalid" for the user to fix."""
+    src = row if isinstance(row, dict) else {}
+    return Transaction(
+        id=src.get("id"), name=str(src.get("name") or "").strip(),
+        extra={"_invalid": row, "_invalid_reason": reason},
+    ).to_row()
+
+def _canonical_rows(rows: Any, where: str, draft: bool = False) -> List[Dict[str, Any]]:
+    """Lenient normalization for stored data (legacy files, old snapshots):
+    rows that fail validation are quarantined (see _quarantine_row), not lost."""
+    out = []
+    for row in rows if isinstance(rows, list) else []:
+        if _is_canonical(row):
+            out.append(row)
+            continue
+        try:
+            out.append(Transaction.from_row(row, draft).to_row())
+        except ValueError as e:
+            logger.warning(f"Quarantining unreadable row in {where}: {e}")
+            out.append(_quarantine_row(row, str(e)))
+    return out
+
+def _needs_migration(path: Path) -> bool:
+    rows = _read_json(path, [])
+    return isinstance(rows, list) and not all(_is_canonical(r) for r in rows)
+
+def _migrate_rows(path: Path, draft: bool = False) -> None:
+    """One-time rewrite of a legacy ledger file into canonical rows (callers
+    snapshot the old files first, see _ensure_user_files)."""
+    with _glock:
+        if _needs_migration(path):
+            rows = _read_json(path, [])
+            logger.info(f"Migrating {path} to canonical rows ({len(rows)} rows)")
+            _atomic_write(path, _canonical_rows(rows, path.name, draft))
+
+def _client_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    if not _is_canonical(row):
+        return row
+    out = dict(row)
+    date = row.get("date") or ""
+    out["date_iso"] = date
+    out["date_str"] = f"{date[8:10]}-{date[5:7]}-{date[:4]}" if date else row.get("date_input", "")
+    out["tag"] = row.get("month_tag")
+    out.setdefault("amount", abs(row.get("debit") or 0.0))
+    return out
+
+def _client_rows(rows: Any) -> List[Dict[str, Any]]:
+    """Re-add the redundant fields the browser reads (date_iso, date_str, tag, amount)."""
+    return [_client_row(r) for r in rows if isinstance(r, dict)] if isinstance(rows, list) else []
+
+def _row_cell(tx: Dict[str, Any]):
+    """(date year, month_tag) of a canonical row, or None if it can't be placed in a month.
+    Like the original statistics code, the year comes from the date, not the stored "year"."""
+    date, tag = tx.get("date") or "", tx.get("month_tag")
+    return (int(date[:4]), tag) if date and tag is not None else None
+
+def _statement_cell(tx: Dict[str, Any]):
+    """(year, month_tag) the row was filed under (what the Summary tab groups by), or None."""
+    year, tag = tx.get("year"), tx.get("month_tag")
+    return (year, tag) if year is not None and tag is not None else None
+
+def _row_amount(tx: Dict[str, Any]) -> float:
+    return abs(tx.get("debit") or 0.0)
+
+# Based on normHebEnVendor / amountClose in client/index.html, but NOT identical,
+# on purpose; server vendor keys can differ from the client's:
+# - company suffixes are stripped before punctuation, and Python's \b is
+#   Unicode-aware, so בע"מ / ח.פ. are removed here (the client's ASCII-only \b
+#   never matches next to Hebrew letters, so it keeps them);
+# - the punctuation class is the intended one (brackets); the client's copy is
+#   garbled and also deletes some lowercase Latin letters.
+# Keys are only compared server-side (recurring, search, rules), never with the client's.
+_VENDOR_BIDI  = re.compile("[\u200f\u200e\u202a\u202b\u202c\u2066\u2067\u2068\u2069\u00a0]")
+_VENDOR_PUNCT = re.compile(r"[\"'`~!@#%^*()_=$\[\]{}|;:<>?,.]")
+_VENDOR_HEB   = re.compile(r"\bבע[\"״']?מ\b|\bח\.?פ\.?\b")
+_VENDOR_LAT   = re.compile(r"\b(ltd|inc|llc)\b", re.IGNORECASE)
+_SPACES       = re.compile(r"\s+")
+
+def _norm_vendor(s: Any) -> str:
+    if not s:
+        return ""
+    s = _VENDOR_BIDI.sub("", str(s))
+    s = _VENDOR_HEB.sub("", s)
+    s = _VENDOR_PUNCT.sub(" ", s)
+    s = _VENDOR_LAT.sub("", s)
+    return _SPACES.sub(" ", s).strip().lower()
+
+def _amount_close(a: float, b: float) -> bool:
+    tol = max(1.0, 0.02 * max(abs(a), abs(b)))   # ±1₪ or 2%
+    return abs(a - b) <= tol
+
+# =============================================================================
+# Budgets: running spent totals kept in memory per user
+# =============================================================================
+# _BUDGET_TOTALS[user] = {"past": {(year, tag): {(cat, sub, currency): spent}}, "stage": {...}}
+# keyed by the statement year/month_tag a row was filed under, like the Summary tab.
+# Built with one pass over past_data the first time it is needed, then kept
+# current by the write endpoints so /api/budgets/status never rescans history.
+# Totals stay per currency; status converts them like Statistics does.
+_BUDGET_TOTALS: Dict[str, Dict[str, Dict]] = {}
+
+def _tally_expenses(rows, into: Dict) -> Dict:
+    for tx in rows:
+        if not isinstance(tx, dict) or tx.get("type", "Expense") != "Expense":
+            continue
+        cell = _statement_cell(tx)
+        if cell is None:
+            continue
+        key = (tx.get("category") or "", tx.get("subcategory") or "", (tx.get("currency") or "ILS").upper())
+        bucket = into.setdefault(cell, {})
+        bucket[key] = bucket.get(key, 0.0) + _row_amount(tx)
+    return into
+
+def _budget_totals(user: str, p: Dict[str, Path]) -> Dict[str, Dict]:
+    with _glock:
+        totals = _BUDGET_TOTALS.get(user)
+        if totals is None:
+            totals = {
+                "past":  _tally_expenses(_read_json(p["past"], []), {}),
+                "stage": _tally_expenses(_read_json(p["stage"], []), {}),
+            }
+            _BUDGET_TOTALS[user] = totals
+        return totals
+
+def _budget_add_past(user: str, rows) -> None:
+    with _glock:
+        totals = _BUDGET_TOTALS.get(user)
+        if totals is not None:
+            _tally_expenses(rows, totals["past"])
+
+def _budget_replace(user: str, part: str, rows) -> None:
+    """part is "past" or "stage"; used when a whole document is overwritten."""
+    with _glock:
+        totals = _BUDGET_TOTALS.get(user)
+        if totals is not None:
+            totals[part] = _tally_expenses(rows, {})
+
+# =============================================================================
+# Recurring charges: incremental per-vendor history + periodicity detection
+# =============================================================================
+# _RECURRING[user] = {vendor_key: {"name": last raw name,
+#                                  "hits": [(month_idx, day, amount, (type, category, subcategory))]}}
+# Fed with each batch committed through /api/transactions; dropped and rebuilt
+# lazily when the ledger is replaced wholesale.
+_RECURRING: Dict[str, Dict[str, Dict]] = {}
+_RECURRING_PERIODS = (1, 2, 3, 6, 12)      # months
+
+def _recurring_feed_rows(vendors: Dict[str, Dict], rows) -> None:
+    for tx in rows:
+        if not isinstance(tx, dict):
+            continue
+        key = _norm_vendor(tx.get("name"))
+        date = tx.get("date") or ""
+        if not key or not date:
+            continue
+        v = vendors.setdefault(key, {"name": "", "hits": []})
+        v["name"] = tx.get("name") or v["name"]
+        meta = (tx.get("type", "Expense"), tx.get("category", ""), tx.get("subcategory", ""))
+        month_idx = int(date[:4]) * 12 + int(date[5:7]) - 1
+        v["hits"].append((month_idx, int(date[8:10]), _row_amount(tx), meta))
+
+def _recurring_state(user: str, p: Dict[str, Path]) -> Dict[str, Dict]:
+    with _glock:
+        vendors = _RECURRING.get(user)
+        if vendors is None:
+            vendors = {}
+            _recurring_feed_rows(vendors, _read_json(p["past"], []))
+            _RECURRING[user] = vendors
+        return vendors
+
+def _recurring_add_past(user: str, rows) -> None:
+    with _glock:
+        vendors = _RECURRING.get(user)
+        if vendors is not None:
+            _recurring_feed_rows(vendors, rows)
+
+def _recurring_invalidate(user: str) -> None:
+    with _glock:
+        _RECURRING.pop(user, None)
+
+def _amount_clusters(hits):
+    """Group hits whose amounts are amountClose to the cluster's first amount."""
+    clusters = []
+    for h in sorted(hits, key=lambda h: h[2]):
+        if clusters and _amount_close(clusters[-1][0][2], h[2]):
+            clusters[-1].append(h)
+        else:
+            clusters.append([h])
+    return clusters
+
+def _detect_recurring(vendors: Dict[str, Dict], latest_month: int):
+    found = []
+    for key, v in vendors.items():
+        for cluster in _amount_clusters(v["hits"]):
+            months = sorted({h[0] for h in cluster})
+            # At least 3 occurrences, and roughly one per month (not a daily coffee)
+            if len(months) < 3 or len(cluster) > 1.5 * len(months):
+                continue
+            gaps = [b - a for a, b in zip(months, months[1:])]
+            period, hits = Counter(gaps).most_common(1)[0]
+            if period not in _RECURRING_PERIODS or hits / len(gaps) < 0.75:
+                continue
+            amounts = sorted(h[2] for h in cluster)
+            tx_type, category, subcategory = max(cluster, key=lambda h: (h[0], h[1]))[3]
+            found.append({
+                "vendor": key,
+                "name": v["name"],
+                "period_months": period,
+                "occurrences": len(months),
+                "amount": round(amounts[len(amounts) // 2], 2),
+                "amount_min": round(amounts[0], 2),
+                "amount_max": round(amounts[-1], 2),
+                "day_of_month": sorted(h[1] for h in cluster)[len(cluster) // 2],
+                "type": tx_type,
+                "category": category,
+                "subcategory": subcategory,
+                "last_year": months[-1] // 12,
+                "last_tag": months[-1] % 12 + 1,
+                "active": latest_month - months[-1] <= period,
+                "_last": months[-1],
+            })
+    found.sort(key=lambda r: (-r["occurrences"], r["vendor"]))
+    return found
+
+# =============================================================================
+# Currency rates: users/<name>/rates.csv -> in-memory date-indexed series
+# =============================================================================
+# rates.csv rows are "date,currency,rate", where rate is the value of one unit
+# of <currency> in the base currency (settings "rateBase", default ILS) and
+# date is YYYY-MM-DD (daily) or YYYY-MM (monthly). Parsed once per file mtime:
+# _RATES[user] = {"mtime": (ns, size), "series": {cur: ([(y, m, d), ...], [rate, ...])},
+#                 "memo": {(cur, base, display, year, month): factor}}
+_RATES: Dict[str, Dict[str, Any]] = {}
+
+def _parse_rate_date(s: str):
+    s = s.strip()
+    try:
+        if len(s) == 7:
+            d = datetime.strptime(s, "%Y-%m")
+        else:
+            d = datetime.strptime(s[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+    return (d.year, d.month, d.day)
+
+def _parse_rates_csv(text: str) -> Dict[str, tuple]:
+    points: Dict[str, list] = {}
+    for rec in csv.reader(io.StringIO(text)):
+        if len(rec) < 3:
+            continue
+        day = _parse_rate_date(rec[0])
+        try:
+            rate = float(rec[2])
+        except ValueError:
+            continue                                        # header / junk line
+        if day is None or rate <= 0:
+            continue
+        points.setdefault(rec[1].strip().upper(), []).append((day, rate))
+    series = {}
+    for cur, pts in points.items():
+        pts.sort()
+        series[cur] = ([d for d, _ in pts], [r for _, r in pts])
+    return series
+
+def _rate_table(user: str, p: Dict[str, Path]) -> Dict[str, Any]:
+    try:
+        st = p["rates"].stat()
+        mtime = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        mtime = None
+    with _glock:
+        table = _RATES.get(user)
+        if table is None or table["mtime"] != mtime:
+            text = p["rates"].read_text(encoding="utf-8") if mtime is not None else ""
+            table = {"mtime": mtime, "series": _parse_rates_csv(text), "memo": {}}
+            _RATES[user] = table
+        return table
+
+def _month_rate(series: Dict[str, tuple], cur: str, year: int, month: int):
+    """Mean of the rates dated inside (year, month), else the latest one before it."""
+    if cur not in series:
+        return None
+    dates, rates = series[cur]
+    lo = bisect_left(dates, (year, month, 1))
+    hi = bisect_left(dates, (year, month, 32))
+    if hi > lo:
+        return sum(rates[lo:hi]) / (hi - lo)
+    if lo > 0:
+        return rates[lo - 1]
+    return rates[0]                                         # before the table starts
+
+def _converter(user: str, p: Dict[str, Path], display: str, base: str):
+    """
+    Returns convert(amount, currency, (year, month)) -> amount in `display`,
+    or None when a rate is missing (callers then count the amount at face
+    value and report it as "unconverted"). Factors are memoized per
+    (currency, month).
+    """
+    table = _rate_table(user, p)
+    series, memo = table["series"], table["memo"]
+
+    def factor(cur, year, month):
+        key = (cur, base, display, year, month)
+        if key not in memo:
+            src = 1.0 if cur == base else _month_rate(series, cur, year, month)
+            dst = 1.0 if display == base else _month_rate(series, display, year, month)
+            memo[key] = None if not src or not dst else src / dst
+        return memo[key]
+
+    def convert(amount: float, cur: str, cell) -> Any:
+        cur = (cur or "ILS").upper()                        # client default for rows
+        if cur == display:
+            return amount
+        f = factor(cur, cell[0], cell[1])
+        return None if f is None else amount * f
+
+    return convert
+
+# =============================================================================
+# Search: inverted index over past_data "name"
+# =============================================================================
+# _SEARCH[user] = {"docs": [row, ...], "postings": {token: {doc_id, ...}}, "vocab": sorted tokens}
+# Tokens come from _norm_vendor, so Hebrew and English names tokenize the way
+# the client matches vendors. Commits append; wholesale replaces rebuild lazily.
+_SEARCH: Dict[str, Dict[str, Any]] = {}
+_TOKEN = re.compile(r"\w+")
+
+def _tokens(s: Any):
+    return _TOKEN.findall(_norm_vendor(s))
+
+def _search_feed_rows(index: Dict[str, Any], rows) -> None:
+    docs, postings, vocab = index["docs"], index["postings"], index["vocab"]
+    for tx in rows:
+        if not isinstance(tx, dict):
+            continue
+        doc_id = len(docs)
+        docs.append(tx)
+        for tok in set(_tokens(tx.get("name"))):
+            if tok not in postings:
+                postings[tok] = set()
+                insort(vocab, tok)
+            postings[tok].add(doc_id)
+
+def _search_index(user: str, p: Dict[str, Path]) -> Dict[str, Any]:
+    with _glock:
+        index = _SEARCH.get(user)
+        if index is None:
+            index = {"docs": [], "postings": {}, "vocab": []}
+            _search_feed_rows(index, _read_json(p["past"], []))
+            _SEARCH[user] = index
+        return index
+
+def _search_add_past(user: str, rows) -> None:
+    with _glock:
+        index = _SEARCH.get(user)
+        if index is not None:
+            _search_feed_rows(index, rows)
+
+def _search_invalidate(user: str) -> None:
+    with _glock:
+        _SEARCH.pop(user, None)
+
+def _within_edits(a: str, b: str, k: int) -> bool:
+    """Levenshtein(a, b) <= k, bailing out as soon as a row exceeds k."""
+    if abs(len(a) - len(b)) > k:
+        return False
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > k:
+            return False
+        prev = cur
+    return prev[-1] <= k
+
+def _match_token(index: Dict[str, Any], q: str, prefix: bool, fuzzy: bool) -> Dict[str, float]:
+    """Vocabulary tokens matching q -> weight (exact 3, prefix 2, fuzzy 1)."""
+    vocab = index["vocab"]
+    hits = {}
+    if q in index["postings"]:
+        hits[q] = 3.0
+    if prefix:
+        i = bisect_left(vocab, q)
+        while i < len(vocab) and vocab[i].startswith(q):
+            hits.setdefault(vocab[i], 2.0)
+            i += 1
+    if fuzzy and len(q) >= 3:
+        k = 1 if len(q) < 6 else 2
+        for tok in vocab:
+            if tok not in hits and _within_edits(q, tok, k):
+                hits[tok] = 1.0
+    return hits
+
+# =============================================================================
+# Recategorization rules: compiled row predicates
+# =============================================================================
+# A rule is {"match": {...}, "set": {...}}:
+#   match.name        pattern tested against the normalized name (_norm_vendor)
+#   match.name_mode   "contains" (default) | "exact" | "regex"
+#   match.amount_min / amount_max   on abs(debit)
+#   match.type / category / subcategory   exact equality
+#   match.date_from / date_to       inclusive, YYYY-MM-DD
+#   set               any of "category", "subcategory", "type"
+# Rules are tried in order; the first match wins for a row.
+_RULE_SET_FIELDS = ("category", "subcategory", "type")
+
+def _compile_rule(rule: Any, n: int):
+    if not isinstance(rule, dict) or not isinstance(rule.get("match"), dict) or not isinstance(rule.get("set"), dict):
+        abort(400, description=f"Rule {n}: expected {{'match': {{...}}, 'set': {{...}}}}")
+    m = rule["match"]
+    updates = {k: v for k, v in rule["set"].items() if k in _RULE_SET_FIELDS}
+    if not updates:
+        abort(400, description=f"Rule {n}: 'set' must change one of {', '.join(_RULE_SET_FIELDS)}")
+    if "type" in updates and updates["type"] not in _TX_TYPES:
+        abort(400, description=f"Rule {n}: type must be one of {', '.join(_TX_TYPES)}")
+    for key in ("category", "subcategory"):
+        if key in updates and not isinstance(updates[key], str):
+            abort(400, description=f"Rule {n}: '{key}' must be a string")
+
+    checks = []
+    if m.get("name"):
+        mode = m.get("name_mode", "contains")
+        needle = _norm_vendor(m["name"])
+        if mode != "regex" and not needle:
+            # e.g. "...": an empty pattern would match every row
+            abort(400, description=f"Rule {n}: name {m['name']!r} is empty after normalization")
+        try:
+            if mode == "regex":
+                rx = re.compile(m["name"], re.IGNORECASE)
+            elif mode == "exact":
+                rx = re.compile("^" + re.escape(needle) + "$")
+            else:
+                rx = re.compile(re.escape(needle))
+        except re.error as e:
+            abort(400, description=f"Rule {n}: bad name pattern ({e})")
+        checks.append(lambda tx, norm: rx.search(norm) is not None)
+    try:
+        lo = float(m["amount_min"]) if m.get("amount_min") not in (None, "") else None
+        hi = float(m["amount_max"]) if m.get("amount_max") not in (None, "") else None
+    except (TypeError, ValueError):
+        abort(400, description=f"Rule {n}: amount bounds must be numbers")
+    if lo is not None:
+        checks.append(lambda tx, norm: _row_amount(tx) >= lo)
+    if hi is not None:
+        checks.append(lambda tx, norm: _row_amount(tx) <= hi)
+    for key in ("type", "category", "subcategory"):
+        if m.get(key) not in (None, ""):
+            want = m[key]
+            checks.append(lambda tx, norm, f=key, w=want: tx.get(f) == w)
+    # Dates are compared as ISO strings, so anything else would silently mis-match
+    for key in ("date_from", "date_to"):
+        if m.get(key) and not (isinstance(m[key], str) and _ISO_DATE.fullmatch(m[key]) and _parse_tx_date(m[key])):
+            abort(400, description=f"Rule {n}: '{key}' must be a YYYY-MM-DD date")
+    if m.get("date_from"):
+        d_from = m["date_from"]
+        checks.append(lambda tx, norm: str(tx.get("date") or "")[:10] >= d_from)
+    if m.get("date_to"):
+        d_to = m["date_to"]
+        checks.append(lambda tx, norm: "" < str(tx.get("date") or "")[:10] <= d_to)
+    if not checks:
+        abort(400, description=f"Rule {n}: 'match' needs at least one condition")
+
+    return (lambda tx, norm: all(c(tx, norm) for c in checks)), updates, bool(m.get("name"))
+
+def _apply_rules(compiled, rows, per_rule: list, write: bool):
+    """Returns (matched, changed) counts; mutates rows in place when write is True."""
+    needs_name = any(uses_name for _, _, uses_name in compiled)
+    matched = changed = 0
+    for tx in rows:
+        if not isinstance(tx, dict):
+            continue
+        norm = _norm_vendor(tx.get("name")) if needs_name else ""
+        for i, (pred, updates, _) in enumerate(compiled):
+            if not pred(tx, norm):
+                continue
+            matched += 1
+            per_rule[i] += 1
+            if any(tx.get(k) != v for k, v in updates.items()):
+                changed += 1
+                if write:
+                    tx.update(updates)
+            break
+    return matched, changed
+
+# =============================================================================
+# History: content-addressed snapshots with row-level deltas
+# =============================================================================
+# users/<name>/.history/
+#   objects/<sha256>.json   one document version, addressed by the hash of its
+#                           canonical JSON. Either {"full": doc, "depth": 0} or,
+#                           for list documents, {"base": <hash>, "depth": n,
+#                           "ops": [["c", i, j] | ["a", [rows...]]]} which copies
+#                           base[i:j] / appends literal rows, in order.
+#   log.json                [{"id", "ts", "reason", "docs": {doc: <hash>}}, ...]
+# A snapshot is taken of the on-disk state right before a destructive write,
+# so every overwritten version can be restored. Unchanged documents map to
+# the same object, and edits cost only the rows that changed.
+_HISTORY_DOCS = ("categories", "stage", "past", "settings", "budgets")
+_HISTORY_DEFAULTS = {"categories": {}, "stage": [], "past": [], "settings": {}, "budgets": {}}
+_HISTORY_MAX_DEPTH = 16     # store a full copy once a delta chain gets this long
+
+def _history_dir(p: Dict[str, Path]) -> Path:
+    return p["past"].parent / ".history"
+
+def _canon(doc: Any) -> str:
+    return json.dumps(doc, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+def _history_obj(hdir: Path, h: str) -> Dict[str, Any]:
+    obj = _read_json(hdir / "objects" / f"{h}.json", None)
+    if obj is None:
+        raise FileNotFoundError(f"history object {h} is missing")
+    return obj
+
+def _history_load(hdir: Path, h: str) -> Any:
+    chain = [_history_obj(hdir, h)]
+    while "full" not in chain[-1]:
+        chain.append(_history_obj(hdir, chain[-1]["base"]))
+    doc = chain.pop()["full"]
+    while chain:
+        out = []
+        for op in chain.pop()["ops"]:
+            if op[0] == "c":
+                out.extend(doc[op[1]:op[2]])
+            else:
+                out.extend(op[1])
+        doc = out
+    return doc
+
+def _history_store(hdir: Path, doc: Any, parent: Any) -> str:
+    text = _canon(doc)
+    h = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    path = hdir / "objects" / f"{h}.json"
+    if path.exists():
+        return h
+    obj = {"full": doc, "depth": 0}
+    if isinstance(doc, list) and parent:
+        try:
+            base = _history_obj(hdir, parent)
+            base_doc = _history_load(hdir, parent)
+        except FileNotFoundError:
+            base = base_doc = None
+        if isinstance(base_doc, list) and base.get("depth", 0) + 1 < _HISTORY_MAX_DEPTH:
+            a = [_canon(r) for r in base_doc]
+            b = [_canon(r) for r in doc]
+            ops = []
+            for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+                if tag == "equal":
+                    ops.append(["c", i1, i2])
+                elif j2 > j1:
+                    ops.append(["a", doc[j1:j2]])
+            delta = {"base": parent, "depth": base.get("depth", 0) + 1, "ops": ops}
+            if len(_canon(delta)) < len(text):
+                obj = delta
+    _atomic_write_text(path, _canon(obj))
+    return h
+
+def _history_retain(log: list) -> list:
+    """Keep the newest MONEYTRON_SNAPSHOT_KEEP snapshots, plus the last one of
+    each day for MONEYTRON_SNAPSHOT_DAYS days."""
+    keep_last = int(os.environ.get("MONEYTRON_SNAPSHOT_KEEP", "30"))
+    keep_days = int(os.environ.get("MONEYTRON_SNAPSHOT_DAYS", "30"))
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+    keep = set(range(max(0, len(log) - keep_last), len(log)))
+    last_of_day = {}
+    for i, entry in enumerate(log):
+        if entry["ts"][:10] >= cutoff:
+            last_of_day[entry["ts"][:10]] = i
+    keep.update(last_of_day.values())
+    return [entry for i, entry in enumerate(log) if i in keep]
+
+def _history_gc(hdir: Path, log: list) -> None:
+    live = set()
+    for entry in log:
+        for h in entry["docs"].values():
+            while h and h not in live:
+                live.add(h)
+                try:
+                    h = _history_obj(hdir, h).get("base")
+                except FileNotFoundError:
+                    break
+    for f in (hdir / "objects").glob("*.json"):
+        if f.stem not in live:
+            f.unlink(missing_ok=True)
+
+def _snapshot(user: str, p: Dict[str, Path], reason: str) -> str:
+    """Record the current on-disk documents; returns the snapshot id."""
+    hdir = _history_dir(p)
+    with _glock:
+        log = _read_json(hdir / "log.json", [])
+        last = log[-1]["docs"] if log else {}
+        docs = {
+            d: _history_store(hdir, _read_json(p[d], _HISTORY_DEFAULTS[d]), last.get(d))
+            for d in _HISTORY_DOCS
+        }
+        if docs == last:
+            return log[-1]["id"]
+        now = datetime.now()
+        entry = {
+            "id": now.strftime("%Y%m%dT%H%M%S%f") + "-" + hashlib.sha256(_canon(docs).encode("utf-8")).hexdigest()[:8],
+            "ts": now.isoformat(timespec="seconds"),
+            "reason": reason,
+            "docs": docs,
+        }
+        kept = _history_retain(log + [entry])
+        _atomic_write(hdir / "log.json", kept)
+        if len(kept) < len(log) + 1:
+            _history_gc(hdir, kept)
+        return entry["id"]
+
+# =============================================================================
+# Export writers: generators yielding file chunks row by row
+# =============================================================================
+_EXPORT_CHUNK = 64 * 1024
+_XML_BAD = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+class _Drain:
+    """Write-only sink collecting bytes until the generator hands them out."""
+
+    def __init__(self):
+        self._parts, self.size, self._pos = [], 0, 0
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self.size += len(b)
+        self._pos += len(b)
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        out, self._parts, self.size = b"".join(self._parts), [], 0
+        return out
+
+class _TellDrain(_Drain):
+    # zipfile must see an unseekable stream (no tell); pyarrow needs tell()
+    def tell(self) -> int:
+        return self._pos
+
+    @property
+    def closed(self) -> bool:
+        return False
+
+def _iter_csv(columns, rows):
+    buf = io.StringIO()
+    buf.write("\ufeff")                                     # BOM so Excel reads Hebrew as UTF-8
+    w = csv.writer(buf)
+    w.writerow(columns)
+    for row in rows:
+        w.writerow(["" if v is None else v for v in row])
+        if buf.tell() >= _EXPORT_CHUNK:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+def _xlsx_cell(v) -> str:
+    if isinstance(v, bool) or v is None:
+        v = "" if v is None else str(v)
+    if isinstance(v, (int, float)):
+        return f"<c><v>{v}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_xml_escape(_XML_BAD.sub("", str(v)))}</t></is></c>'
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="MoneyTron" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+def _iter_xlsx(columns, rows):
+    """Minimal single-sheet XLSX (inline strings), zipped on the fly."""
+    drain = _Drain()
+    with zipfile.ZipFile(drain, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS.items():
+            zf.writestr(name, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as ws:
+            ws.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            ws.write(("<row>" + "".join(_xlsx_cell(c) for c in columns) + "</row>").encode("utf-8"))
+            for row in rows:
+                ws.write(("<row>" + "".join(_xlsx_cell(v) for v in row) + "</row>").encode("utf-8"))
+                if drain.size >= _EXPORT_CHUNK:
+                    yield drain.take()
+            ws.write(b"</sheetData></worksheet>")
+    yield drain.take()
+
+def _iter_parquet(columns, rows, numeric=(), integer=(), batch_rows=10000):
+    """Parquet via optional pyarrow; one row group per batch_rows rows.
+    numeric columns are float64, integer columns int64, the rest strings
+    (missing strings are "", as in the CSV/XLSX writers)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (c, pa.int64() if c in integer else pa.float64() if c in numeric else pa.string()) for c in columns
+    ])
+
+    def col(vals, c):
+        if c in integer:
+            return [None if v in (None, "") else int(v) for v in vals]
+        if c in numeric:
+            return [None if v in (None, "") else float(v) for v in vals]
+        return ["" if v is None else str(v) for v in vals]
+
+    drain = _TellDrain()
+    writer = pq.ParquetWriter(drain, schema)
+    batch = []
+
+    def flush():
+        cols = list(zip(*batch)) if batch else [[] for _ in columns]
+        writer.write_table(pa.table({c: col(v, c) for c, v in zip(columns, cols)}, schema=schema))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_rows:
+            flush()
+            yield drain.take()
+    if batch:
+        flush()
+    writer.close()
+    yield drain.take()
+
+_EXPORT_FORMATS = {
+    "csv":     ("text/csv; charset=utf-8", _iter_csv),
+    "xlsx":    ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", _iter_xlsx),
+    "parquet": ("application/vnd.apache.parquet", _iter_parquet),
+}
+
+# =============================================================================
+# Derived per-user state: keep caches in step with ledger writes
+# =============================================================================
+def _past_appended(user: str, rows) -> None:
+    """Rows were appended to past_data (commit)."""
+    _budget_add_past(user, rows)
+    _recurring_add_past(user, rows)
+    _search_add_past(user, rows)
+
+def _past_replaced(user: str, rows) -> None:
+    """past_data was overwritten as a whole (Data tab save, import, clear)."""
+    _budget_replace(user, "past", rows)
+    _recurring_invalidate(user)
+    _search_invalidate(user)
+
+# =============================================================================
+# Startup warm-up (provision users and build caches off the serving path)
+# =============================================================================
+# MONEYTRON_WARMUP: "background" (default) | "sync" | "off"
+_WARMUP = {"state": "off", "ms": None}
+
+def _warm_up() -> None:
+    _WARMUP["state"] = "running"
+    t = time.perf_counter()
+    try:
+        for d in sorted(USERS_DIR.iterdir()):
+            if not d.is_dir():
+                continue
+            p = _ensure_user_files(d.name)
+            _budget_totals(d.name, p)
+            _recurring_state(d.name, p)
+            _search_index(d.name, p)
+            _rate_table(d.name, p)
+    except Exception:
+        logger.exception("Warm-up failed; caches will build on first use")
+    _WARMUP["ms"] = round((time.perf_counter() - t) * 1000, 1)
+    _WARMUP["state"] = "done"
+    logger.info(f"Warm-up finished in {_WARMUP['ms']} ms")
+
+def _start_warm_up(mode: str) -> None:
+    if mode == "off":
+        return
+    _WARMUP["state"] = "pending"
+    if mode == "sync":
+        _warm_up()
+    else:
+        Thread(target=_warm_up, name="moneytron-warmup", daemon=True).start()
+
 # =============================================================================
 # UI & health
 # =============================================================================
@@ -153,7 +1153,8 @@ def client_files(filename: str):
 
 @app.route("/api/health")
 def health():
-    return jsonify({"ok": True, "ts": datetime.utcnow().isoformat() + "Z"})
+    lock = {k: round(v, 2) for k, v in _glock.stats.items()}
+    return jsonify({"ok": True, "ts": datetime.utcnow().isoformat() + "Z", "warmup": _WARMUP["state"], "lock": lock})
 
 # =============================================================================
 # Auth / session (simple cookie-style for local use)
@@ -194,8 +1195,8 @@ def api_bootstrap():
     return jsonify({
         "user": user,
         "categories": _read_json(p["categories"], {}),
-        "current_month": _read_json(p["stage"], []),
-        "past_data": _read_json(p["past"], []),
+        "current_month": _client_rows(_read_json(p["stage"], [])),
+        "past_data": _client_rows(_read_json(p["past"], [])),
         "settings": _read_json(p["settings"], {"dateFormat": "YYYY-MM-DD", "currency": "ILS"})
     })
 
@@ -230,13 +1231,15 @@ def api_current_month():
     p = _ensure_user_files(user)
 
     if request.method == "GET":
-        return jsonify({"current_month": _read_json(p["stage"], [])})
+        return jsonify({"current_month": _client_rows(_read_json(p["stage"], []))})
 
     payload = request.get_json(force=True)
-    rows = payload.get("transactions") or payload.get("items") or []
-    if not isinstance(rows, list):
-        abort(400, description="'transactions' must be a list")
-    _atomic_write(p["stage"], rows)
+    # Autosave of half-typed rows: a date the user is still editing must not
+    # fail the whole save (commit, import and past-data stay strict).
+    rows = _normalize_rows(payload.get("transactions") or payload.get("items") or [], "transactions", draft=True)
+    with _glock:
+        _atomic_write(p["stage"], rows)
+        _budget_replace(user, "stage", rows)
     return jsonify({"ok": True})
 
 @app.route('/api/current-month/reset', methods=['POST'])
@@ -246,7 +1249,9 @@ def reset_current_month():
         return jsonify({'error': 'Not logged in'}), 401
 
     p = _ensure_user_files(user)
-    _atomic_write(p['stage'], [])
+    with _glock:
+        _atomic_write(p['stage'], [])
+        _budget_replace(user, "stage", [])
     return jsonify({'ok': True})
 
 # =============================================================================
@@ -258,13 +1263,14 @@ def api_past_data():
     p = _ensure_user_files(user)
 
     if request.method == "GET":
-        return jsonify({"past_data": _read_json(p["past"], [])})
+        return jsonify({"past_data": _client_rows(_read_json(p["past"], []))})
 
     payload = request.get_json(force=True)
-    rows = payload.get("past_data") or payload.get("items") or []
-    if not isinstance(rows, list):
-        abort(400, description="'past_data' must be a list")
-    _atomic_write(p["past"], rows)
+    rows = _normalize_rows(payload.get("past_data") or payload.get("items") or [], "past_data")
+    with _glock:
+        _snapshot(user, p, "past-data save")
+        _atomic_write(p["past"], rows)
+        _past_replaced(user, rows)
     return jsonify({"ok": True})
 
 # =============================================================================
@@ -276,24 +1282,27 @@ def api_transactions():
     p = _ensure_user_files(user)
 
     payload = request.get_json(force=True)
-    rows = payload.get("transactions") or []
-    if not isinstance(rows, list):
-        abort(400, description="'transactions' must be a list")
+    rows = _normalize_rows(payload.get("transactions") or [], "transactions")
 
-    past = _read_json(p["past"], [])
-    seen = {str(x.get("id")) for x in past if isinstance(x, dict) and x.get("id") is not None}
-    for r in rows:
-        if not isinstance(r, dict): 
-            continue
-        rid = str(r.get("id"))
-        if rid and rid in seen:
-            continue
-        past.append(r)
-        if rid:
-            seen.add(rid)
+    # Read -> append -> write -> cache update under one lock hold, so concurrent
+    # commits can't lose rows and the running totals/indexes mirror the file.
+    with _glock:
+        past = _read_json(p["past"], [])
+        seen = {str(x.get("id")) for x in past if isinstance(x, dict) and x.get("id") is not None}
+        added = []
+        for r in rows:
+            rid = str(r.get("id"))
+            if rid and rid in seen:
+                continue
+            past.append(r)
+            added.append(r)
+            if rid:
+                seen.add(rid)
 
-    _atomic_write(p["past"], past)
-    _atomic_write(p["stage"], [])
+        _atomic_write(p["past"], past)
+        _atomic_write(p["stage"], [])
+        _past_appended(user, added)
+        _budget_replace(user, "stage", [])
     return jsonify({"ok": True, "saved": len(rows)})
 
 # =============================================================================
@@ -319,11 +1328,346 @@ def api_settings():
     cur.update({
         "dateFormat": s.get("dateFormat", cur.get("dateFormat", "YYYY-MM-DD")),
         "currency":   s.get("currency",   cur.get("currency", "ILS")),
-        "allowedCurrencies": s.get("allowedCurrencies", cur.get("allowedCurrencies", ["ILS", "USD"]))
+        "allowedCurrencies": s.get("allowedCurrencies", cur.get("allowedCurrencies", ["ILS", "USD"])),
+        "rateBase":   s.get("rateBase",   cur.get("rateBase", "ILS"))
     })
     _atomic_write(p["settings"], cur)
     return jsonify({"ok": True})
 
+# =============================================================================
+# Budgets
+# =============================================================================
+def _clean_budgets(raw: Any) -> Dict[str, Dict[str, Any]]:
+    if not isinstance(raw, dict):
+        abort(400, description="'budgets' must be an object {category: {limit, subcategories}}")
+    out = {}
+    for cat, spec in raw.items():
+        if isinstance(spec, (int, float)):
+            spec = {"limit": spec}
+        if not isinstance(spec, dict):
+            abort(400, description=f"Budget for '{cat}' must be an object")
+        subs = spec.get("subcategories") or {}
+        if not isinstance(subs, dict):
+            abort(400, description=f"'subcategories' of '{cat}' must be an object")
+        try:
+            limit = spec.get("limit")
+            out[cat] = {
+                "limit": None if limit in (None, "") else float(limit),
+                "subcategories": {sub: float(v) for sub, v in subs.items()},
+            }
+        except (TypeError, ValueError):
+            abort(400, description=f"Budget amounts for '{cat}' must be numbers")
+    return out
+
+@app.route("/api/budgets", methods=["GET", "POST"])
+def api_budgets():
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    if request.method == "GET":
+        return jsonify(_read_json(p["budgets"], {}))
+
+    payload = request.get_json(force=True)
+    _atomic_write(p["budgets"], _clean_budgets(payload.get("budgets", {})))
+    return jsonify({"ok": True})
+
+@app.route("/api/budgets/status", methods=["GET"])
+def api_budgets_status():
+    """
+    Spent vs. budget for one month, from the in-memory running totals.
+    Query: ?year=2025&tag=10 (defaults to the current calendar month),
+    &currency=ILS (defaults to settings.currency).
+    Spent = committed (past_data) + staged (current month) expenses, converted
+    to the display currency the same way /api/statistics converts them.
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+    now = datetime.now()
+    try:
+        cell = (int(request.args.get("year", now.year)), int(request.args.get("tag", now.month)))
+    except ValueError:
+        abort(400, description="'year' and 'tag' must be integers")
+
+    budgets = _read_json(p["budgets"], {})
+    settings = _read_json(p["settings"], {})
+    display = str(request.args.get("currency") or settings.get("currency") or "ILS").upper()
+    convert = _converter(user, p, display, str(settings.get("rateBase") or "ILS").upper())
+    with _glock:
+        totals = _budget_totals(user, p)
+        committed = dict(totals["past"].get(cell, {}))
+        staged = dict(totals["stage"].get(cell, {}))
+
+    # [committed, staged] per category and per (category, subcategory)
+    by_cat: Dict[str, list] = {}
+    by_sub: Dict[tuple, list] = {}
+    unconverted = set()
+    for i, src in enumerate((committed, staged)):
+        for (cat, sub, cur), raw in src.items():
+            amt = convert(raw, cur, cell)
+            if amt is None:                                 # no rate: face value, see /api/statistics
+                unconverted.add(cur)
+                amt = raw
+            by_cat.setdefault(cat, [0.0, 0.0])[i] += amt
+            by_sub.setdefault((cat, sub), [0.0, 0.0])[i] += amt
+
+    def line(name, limit, pair):
+        c, s = pair
+        return {
+            "name": name,
+            "limit": limit,
+            "committed": round(c, 2),
+            "staged": round(s, 2),
+            "spent": round(c + s, 2),
+            "remaining": None if limit is None else round(limit - (c + s), 2),
+        }
+
+    out = []
+    for cat, spec in budgets.items():
+        if not isinstance(spec, dict):
+            continue
+        row = line(cat, spec.get("limit"), by_cat.get(cat, (0.0, 0.0)))
+        row["subcategories"] = [
+            line(sub, limit, by_sub.get((cat, sub), (0.0, 0.0)))
+            for sub, limit in (spec.get("subcategories") or {}).items()
+        ]
+        out.append(row)
+
+    return jsonify({"year": cell[0], "tag": cell[1], "currency": display, "budgets": out,
+                    "unconverted_currencies": sorted(unconverted)})
+
+# =============================================================================
+# Recurring charges
+# =============================================================================
+@app.route("/api/recurring", methods=["GET"])
+def api_recurring():
+    """
+    Recurring charges found in past_data plus a baseline for the next month.
+    Query: ?year=2025&tag=11 picks the month to predict (defaults to the
+    month after the latest one in past_data).
+
+    Returns:
+    {
+      "recurring": [{"vendor": "freetv", "period_months": 1, "amount": 79.9, "active": true, ...}],
+      "next_month": {"year": 2025, "tag": 11, "expense": 5120.0, "income": 14000.0, "items": [...]}
+    }
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    with _glock:
+        vendors = _recurring_state(user, p)
+        latest = max((h[0] for v in vendors.values() for h in v["hits"]), default=None)
+        found = _detect_recurring(vendors, latest if latest is not None else 0)
+
+    if latest is None:
+        now = datetime.now()
+        latest = now.year * 12 + now.month - 2
+    target = latest + 1
+    try:
+        if "year" in request.args or "tag" in request.args:
+            target = int(request.args.get("year", target // 12)) * 12 + int(request.args.get("tag", target % 12 + 1)) - 1
+    except ValueError:
+        abort(400, description="'year' and 'tag' must be integers")
+
+    due = [r for r in found if r["active"] and target > r["_last"] and (target - r["_last"]) % r["period_months"] == 0]
+    baseline = {"Expense": 0.0, "Income": 0.0}
+    for r in due:
+        if r["type"] in baseline:
+            baseline[r["type"]] += r["amount"]
+
+    for r in found:
+        r.pop("_last", None)
+    return jsonify({
+        "recurring": found,
+        "next_month": {
+            "year": target // 12,
+            "tag": target % 12 + 1,
+            "expense": round(baseline["Expense"], 2),
+            "income": round(baseline["Income"], 2),
+            "items": due,
+        },
+    })
+
+# =============================================================================
+# Search
+# =============================================================================
+@app.route("/api/search", methods=["GET"])
+def api_search():
+    """
+    Search past_data by transaction name.
+    Query: ?q=wolt&page=1&per_page=50&prefix=1&fuzzy=1
+
+    Each query token scores 3 for an exact token match, 2 for a prefix match
+    and 1 for a fuzzy (1-2 edit) match; results are ranked by total score,
+    then newest first.
+
+    Returns:
+    {"q": "wolt", "total": 12, "page": 1, "per_page": 50,
+     "results": [{"score": 3.0, "row": {...}}, ...]}
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    q = request.args.get("q", "")
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        per_page = min(500, max(1, int(request.args.get("per_page", 50))))
+    except ValueError:
+        abort(400, description="'page' and 'per_page' must be integers")
+    prefix = request.args.get("prefix", "1") not in ("0", "false")
+    fuzzy = request.args.get("fuzzy", "1") not in ("0", "false")
+
+    scores: Dict[int, float] = {}
+    with _glock:
+        index = _search_index(user, p)
+        for qt in set(_tokens(q)):
+            best: Dict[int, float] = {}
+            for tok, weight in _match_token(index, qt, prefix, fuzzy).items():
+                for doc_id in index["postings"][tok]:
+                    if weight > best.get(doc_id, 0.0):
+                        best[doc_id] = weight
+            for doc_id, weight in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        docs = index["docs"]
+        ranked = sorted(scores.items(), key=lambda kv: str(docs[kv[0]].get("date", "")), reverse=True)
+        ranked.sort(key=lambda kv: kv[1], reverse=True)          # stable: score, then newest
+        start = (page - 1) * per_page
+        results = [{"score": score, "row": _client_row(docs[doc_id])} for doc_id, score in ranked[start:start + per_page]]
+
+    return jsonify({"q": q, "total": len(ranked), "page": page, "per_page": per_page, "results": results})
+
+# =============================================================================
+# Recategorization rules
+# =============================================================================
+@app.route("/api/rules", methods=["GET", "POST"])
+def api_rules():
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    if request.method == "GET":
+        return jsonify(_read_json(p["rules"], []))
+
+    payload = request.get_json(force=True)
+    rules = payload.get("rules", [])
+    if not isinstance(rules, list):
+        abort(400, description="'rules' must be a list")
+    for n, rule in enumerate(rules):
+        _compile_rule(rule, n)
+    _atomic_write(p["rules"], rules)
+    return jsonify({"ok": True})
+
+@app.route("/api/rules/apply", methods=["POST"])
+def api_rules_apply():
+    """
+    Apply rules in bulk to past_data and/or staging.
+
+    Expects JSON body:
+    {
+      "rules": [...] (optional, defaults to the saved rules.json),
+      "targets": ["past", "stage"] (optional, default both),
+      "dry_run": true (optional; report counts without writing)
+    }
+
+    Returns:
+    {"ok": true, "dry_run": true,
+     "matched": {"past": 120, "stage": 4}, "changed": {"past": 37, "stage": 4},
+     "per_rule": [96, 28]}
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    payload = request.get_json(force=True)
+    rules = payload["rules"] if "rules" in payload else _read_json(p["rules"], [])
+    if not isinstance(rules, list):
+        abort(400, description="'rules' must be a list")
+    targets = payload.get("targets") or ["past", "stage"]
+    if not isinstance(targets, list) or any(t not in ("past", "stage") for t in targets):
+        abort(400, description="'targets' must be a subset of ['past', 'stage']")
+    dry_run = bool(payload.get("dry_run", False))
+    compiled = [_compile_rule(rule, n) for n, rule in enumerate(rules)]
+
+    per_rule = [0] * len(compiled)
+    matched, changed = {}, {}
+    # One lock hold covers read -> apply -> write of every target, so no other
+    # request can interleave a write between the ledger and the staging file.
+    with _glock:
+        docs = {t: _read_json(p[t], []) for t in targets}
+        for t, rows in docs.items():
+            matched[t], changed[t] = _apply_rules(compiled, rows, per_rule, write=not dry_run)
+        if not dry_run and any(changed.values()):
+            _snapshot(user, p, "rules apply")
+            for t, rows in docs.items():
+                if not changed[t]:
+                    continue
+                _atomic_write(p[t], rows)
+                if t == "past":
+                    _past_replaced(user, rows)
+                else:
+                    _budget_replace(user, "stage", rows)
+
+    return jsonify({"ok": True, "dry_run": dry_run, "matched": matched, "changed": changed, "per_rule": per_rule})
+
+# =============================================================================
+# History (snapshots / restore)
+# =============================================================================
+@app.route("/api/history", methods=["GET"])
+def api_history():
+    """Snapshots, newest first: [{"id", "ts", "reason", "docs": [...]}]."""
+    user = _require_user()
+    p = _ensure_user_files(user)
+    log = _read_json(_history_dir(p) / "log.json", [])
+    return jsonify([
+        {"id": e["id"], "ts": e["ts"], "reason": e["reason"], "docs": sorted(e["docs"])}
+        for e in reversed(log)
+    ])
+
+@app.route("/api/history/snapshot", methods=["POST"])
+def api_history_snapshot():
+    user = _require_user()
+    p = _ensure_user_files(user)
+    return jsonify({"ok": True, "id": _snapshot(user, p, "manual")})
+
+@app.route("/api/history/restore", methods=["POST"])
+def api_history_restore():
+    """
+    Restore documents from a snapshot.
+
+    Expects JSON body:
+    {"id": "<snapshot id>", "docs": ["past", "stage", ...] (optional, default all)}
+
+    The current state is snapshotted first, so a restore can itself be undone.
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+
+    payload = request.get_json(force=True)
+    hdir = _history_dir(p)
+    with _glock:
+        log = _read_json(hdir / "log.json", [])
+        entry = next((e for e in log if e["id"] == payload.get("id")), None)
+        if entry is None:
+            abort(404, description="Unknown snapshot id")
+        docs = payload.get("docs") or list(entry["docs"])
+        if not isinstance(docs, list) or any(d not in entry["docs"] for d in docs):
+            abort(400, description=f"'docs' must be a subset of {sorted(entry['docs'])}")
+        try:
+            restored = {d: _history_load(hdir, entry["docs"][d]) for d in docs}
+        except FileNotFoundError as e:
+            abort(500, description=str(e))
+        for d in ("past", "stage"):
+            if d in restored:                        # snapshots may predate canonical rows
+                restored[d] = _canonical_rows(restored[d], f"snapshot {entry['id']}", draft=(d == "stage"))
+
+        _snapshot(user, p, f"before restore {entry['id']}")
+        for d, doc in restored.items():
+            _atomic_write(p[d], doc)
+        if "past" in restored:
+            _past_replaced(user, restored["past"])
+        if "stage" in restored:
+            _budget_replace(user, "stage", restored["stage"])
+
+    return jsonify({"ok": True, "restored": sorted(restored)})
+
 # =============================================================================
 # Import / Clear
 # =============================================================================
@@ -334,29 +1678,34 @@ def api_import():
 
     payload = request.get_json(force=True)
 
-    if "categories" in payload:
-        if not isinstance(payload["categories"], dict):
-            abort(400, description="'categories' must be an object")
-        _atomic_write(p["categories"], payload["categories"])
-
-    if "current_month" in payload:
-        if not isinstance(payload["current_month"], list):
-            abort(400, description="'current_month' must be a list")
-        _atomic_write(p["stage"], payload["current_month"])
-
-    if "past_data" in payload:
-        if not isinstance(payload["past_data"], list):
-            abort(400, description="'past_data' must be a list")
-        _atomic_write(p["past"], payload["past_data"])
-
-    if "settings" in payload:
-        s = payload["settings"]
-        if not isinstance(s, dict):
-            abort(400, description="'settings' must be an object")
-        _atomic_write(p["settings"], {
-            "dateFormat": s.get("dateFormat", "YYYY-MM-DD"),
-            "currency":   s.get("currency", "ILS")
-        })
+    # Validate every part before writing anything, so a 400 leaves no half-applied import
+    if "categories" in payload and not isinstance(payload["categories"], dict):
+        abort(400, description="'categories' must be an object")
+    if "settings" in payload and not isinstance(payload["settings"], dict):
+        abort(400, description="'settings' must be an object")
+    stage = _normalize_rows(payload["current_month"], "current_month") if "current_month" in payload else None
+    past = _normalize_rows(payload["past_data"], "past_data") if "past_data" in payload else None
+
+    with _glock:
+        _snapshot(user, p, "import")
+
+        if "categories" in payload:
+            _atomic_write(p["categories"], payload["categories"])
+
+        if stage is not None:
+            _atomic_write(p["stage"], stage)
+            _budget_replace(user, "stage", stage)
+
+        if past is not None:
+            _atomic_write(p["past"], past)
+            _past_replaced(user, past)
+
+        if "settings" in payload:
+            s = payload["settings"]
+            _atomic_write(p["settings"], {
+                "dateFormat": s.get("dateFormat", "YYYY-MM-DD"),
+                "currency":   s.get("currency", "ILS")
+            })
 
     return jsonify({"ok": True})
 
@@ -364,50 +1713,142 @@ def api_import():
 def api_clear_all():
     user = _require_user()
     p = _ensure_user_files(user)
-    _atomic_write(p["categories"], {})
-    _atomic_write(p["stage"], [])
-    _atomic_write(p["past"], [])
+    with _glock:
+        _snapshot(user, p, "clear-all")
+        _atomic_write(p["categories"], {})
+        _atomic_write(p["stage"], [])
+        _atomic_write(p["past"], [])
+        _budget_replace(user, "stage", [])
+        _past_replaced(user, [])
     return jsonify({"ok": True})
 
 # =============================================================================
-# Statistics endpoints
+# Currency rates
 # =============================================================================
-@app.route("/api/statistics", methods=["POST"])
-def api_statistics():
+@app.route("/api/rates", methods=["GET", "POST"])
+def api_rates():
     """
-    New unified statistics endpoint.
-    Computes monthly statistics over selected (year, tag) cells.
-    
-    Expects JSON body:
-    {
-      "years": [2025, 2024, ...],
-      "tagsByYear": {"2025": [7,8,9], "2024": [10,11,12]},
-      "type": "Expense" | "Income",
-      "categories": ["אוכל", ...] (optional, empty = all),
-      "subcategories": ["קפה", ...] (optional, only if 1 category selected),
-      "quickFilter": "none" | "last3" | "last6" | "alltime" (optional)
-    }
-    
-    Returns:
-    {
-      "months": [{"year": 2025, "tag": 7, "total": 8536.60, "count": 45}, ...],
-      "summary": {
-        "total_over_period": 24643.87,
-        "avg_monthly": 8214.62,
-        "median_monthly": 7433.10,
-        "min_monthly": 3393.83,
-        "max_monthly": 12643.87
-      },
-      "top_categories": [
-        {"name": "אוכל", "total": 9000.0, "avg_per_month": 3000.0},
-        ...
-      ]
-    }
+    GET  -> {"base": "ILS", "currencies": {"USD": {"points": 24, "from": "2024-01-01", "to": "2025-12-01"}}}
+    POST {"csv": "date,currency,rate\n2025-10,USD,3.71\n..."} replaces rates.csv
     """
     user = _require_user()
     p = _ensure_user_files(user)
-    
-    payload = request.get_json(force=True)
+
+    if request.method == "POST":
+        payload = request.get_json(force=True)
+        text = payload.get("csv")
+        if not isinstance(text, str):
+            abort(400, description="'csv' must be a string")
+        if text.strip() and not _parse_rates_csv(text):
+            abort(400, description="No valid 'date,currency,rate' rows found")
+        _atomic_write_text(p["rates"], text)
+        return jsonify({"ok": True})
+
+    series = _rate_table(user, p)["series"]
+    fmt = lambda d: "%04d-%02d-%02d" % d
+    return jsonify({
+        "base": _read_json(p["settings"], {}).get("rateBase", "ILS"),
+        "currencies": {
+            cur: {"points": len(dates), "from": fmt(dates[0]), "to": fmt(dates[-1])}
+            for cur, (dates, _) in sorted(series.items())
+        },
+    })
+
+# =============================================================================
+# Exports (streamed)
+# =============================================================================
+_EXPORT_COLUMNS = ["date", "name", "debit", "currency", "type", "category", "subcategory",
+                   "year", "month_tag", "notes", "id"]
+
+def _export_request():
+    """(format, filters) from a POST JSON body or GET ?format=&filters=<json>."""
+    if request.method == "POST":
+        payload = request.get_json(force=True) or {}
+        filters = payload.get("filters", payload)
+        fmt = payload.get("format") or request.args.get("format", "csv")
+    else:
+        try:
+            filters = json.loads(request.args.get("filters") or "{}")
+        except ValueError:
+            abort(400, description="'filters' must be JSON")
+        fmt = request.args.get("format", "csv")
+    fmt = str(fmt).lower()
+    if fmt not in _EXPORT_FORMATS:
+        abort(400, description=f"'format' must be one of {', '.join(_EXPORT_FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            abort(501, description="Parquet export needs pyarrow (pip install pyarrow)")
+    if not isinstance(filters, dict):
+        abort(400, description="'filters' must be an object")
+    return fmt, _clean_month_selection(filters)
+
+def _clean_month_selection(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Coerce years/tagsByYear to ints (400 on bad values) before _statistics_selection."""
+    years, tags_by_year = filters.get("years", []), filters.get("tagsByYear", {})
+    if not isinstance(years, list) or not isinstance(tags_by_year, dict) \
+            or not all(isinstance(t, list) for t in tags_by_year.values()):
+        abort(400, description="'years' must be a list and 'tagsByYear' an object of lists")
+    try:
+        return dict(filters,
+                    years=[int(y) for y in years],
+                    tagsByYear={str(int(y)): [int(t) for t in tags] for y, tags in tags_by_year.items()})
+    except (TypeError, ValueError):
+        abort(400, description="'years' and 'tagsByYear' must hold integers")
+
+def _export_response(fmt: str, basename: str, columns, rows, numeric=(), integer=()):
+    mimetype, writer = _EXPORT_FORMATS[fmt]
+    chunks = writer(columns, rows, numeric=numeric, integer=integer) if fmt == "parquet" else writer(columns, rows)
+    filename = f"{basename}_{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.route("/api/export/past-data", methods=["GET", "POST"])
+def api_export_past_data():
+    """
+    Stream past_data as CSV / XLSX / Parquet.
+    Filters are the /api/statistics body (years, tagsByYear, quickFilter,
+    type, categories, subcategories); no month selection exports every month
+    and "type" defaults to "All".
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+    fmt, filters = _export_request()
+
+    filters = dict(filters)
+    filters.setdefault("type", "All")
+    _, rows = _statistics_selection(filters, _read_json(p["past"], []), all_if_empty=True)
+    return _export_response(fmt, "moneytron_past_data", _EXPORT_COLUMNS,
+                            ([tx.get(c) for c in _EXPORT_COLUMNS] for tx in rows),
+                            numeric=("debit",), integer=("year", "month_tag"))
+
+@app.route("/api/export/statistics", methods=["GET", "POST"])
+def api_export_statistics():
+    """Stream the monthly table of /api/statistics (same filters) as CSV / XLSX / Parquet."""
+    user = _require_user()
+    p = _ensure_user_files(user)
+    fmt, filters = _export_request()
+
+    stats = _compute_statistics(user, p, filters)
+    if stats.get("error"):
+        abort(400, description=stats["error"])
+    columns = ["year", "tag", "total", "count", "currency"]
+    currency = stats.get("currency", "")
+    return _export_response(fmt, "moneytron_statistics", columns,
+                            ([m["year"], m["tag"], m["total"], m["count"], currency] for m in stats["months"]),
+                            numeric=("total",), integer=("year", "tag", "count"))
+
+# =============================================================================
+# Statistics endpoints
+# =============================================================================
+def _statistics_selection(payload: Dict[str, Any], past: list, all_if_empty: bool = False):
+    """
+    Apply the /api/statistics filters (years/tagsByYear/quickFilter, type,
+    categories, subcategories) to past rows.
+    Returns (selected (year, tag) cells, matching rows). With all_if_empty, an
+    empty month selection matches every month instead of none.
+    """
     years = payload.get("years", [])
     tags_by_year = payload.get("tagsByYear", {})
     tx_type = payload.get("type", "Expense")
@@ -415,25 +1856,14 @@ def api_statistics():
     subcategories_filter = payload.get("subcategories", [])
     quick_filter = payload.get("quickFilter", "none")
     
-    past = _read_json(p["past"], [])
-    
     # Handle quick filters by deriving years and tags from data
     if quick_filter in ["last3", "last6", "alltime"]:
         # Build list of (year, tag) pairs from data with dates
         year_tag_pairs = set()
         for tx in past:
-            if not isinstance(tx, dict):
-                continue
-            date_str = tx.get("date", "")
-            if not date_str or len(date_str) < 4:
-                continue
-            try:
-                year = int(date_str[:4])
-            except:
-                continue
-            tag = tx.get("month_tag") or tx.get("tag")
-            if tag is not None:
-                year_tag_pairs.add((year, int(tag)))
+            cell = _row_cell(tx)
+            if cell is not None:
+                year_tag_pairs.add(cell)
         
         # Sort by (year, tag) descending to get most recent first
         sorted_pairs = sorted(year_tag_pairs, reverse=True)
@@ -462,46 +1892,19 @@ def api_statistics():
         for tag in tags_for_year:
             selected_cells.add((int(year), int(tag)))
     
-    # Validate: must have at least 2 cells
-    if len(selected_cells) < 2:
-        return jsonify({
-            "error": "Select at least two months to calculate statistics.",
-            "months": [],
-            "summary": {
-                "total_over_period": 0,
-                "avg_monthly": 0,
-                "median_monthly": 0,
-                "min_monthly": 0,
-                "max_monthly": 0
-            },
-            "top_categories": []
-        })
-    
     # Filter transactions based on selection
     filtered = []
     for tx in past:
-        if not isinstance(tx, dict):
-            continue
-        
-        # Derive year from date
-        date_str = tx.get("date", "")
-        if not date_str or len(date_str) < 4:
-            continue
-        try:
-            tx_year = int(date_str[:4])
-        except:
-            continue
-        
-        tx_tag = tx.get("month_tag") or tx.get("tag")
-        if tx_tag is None:
+        cell = _row_cell(tx)
+        if cell is None:
             continue
         
         # Check if (year, tag) is in selected cells
-        if (tx_year, int(tx_tag)) not in selected_cells:
+        if (selected_cells or not all_if_empty) and cell not in selected_cells:
             continue
         
-        # Filter by type (must be exact match - no "All")
-        if tx.get("type") != tx_type:
+        # Filter by type (exact match; "All" only for exports)
+        if tx_type != "All" and tx.get("type") != tx_type:
             continue
         
         # Filter by categories
@@ -516,21 +1919,48 @@ def api_statistics():
         
         filtered.append(tx)
     
+    return selected_cells, filtered
+
+def _compute_statistics(user: str, p: Dict[str, Path], payload: Dict[str, Any]) -> Dict[str, Any]:
+    past = _read_json(p["past"], [])
+    categories_filter = payload.get("categories", [])
+    selected_cells, filtered = _statistics_selection(payload, past)
+    
+    # Validate: must have at least 2 cells
+    if len(selected_cells) < 2:
+        return {
+            "error": "Select at least two months to calculate statistics.",
+            "months": [],
+            "summary": {
+                "total_over_period": 0,
+                "avg_monthly": 0,
+                "median_monthly": 0,
+                "min_monthly": 0,
+                "max_monthly": 0
+            },
+            "top_categories": []
+        }
+    
+    # Normalize every amount to the display currency once, up front
+    settings = _read_json(p["settings"], {})
+    display = str(payload.get("currency") or settings.get("currency") or "ILS").upper()
+    convert = _converter(user, p, display, str(settings.get("rateBase") or "ILS").upper())
+    converted = []
+    unconverted = 0
+    for tx in filtered:
+        cell = _row_cell(tx)
+        amount = convert(_row_amount(tx), tx.get("currency"), cell)
+        if amount is None:                                  # no rate: face value, as before rates.csv
+            unconverted += 1
+            amount = _row_amount(tx)
+        converted.append((tx, cell, amount))
+
     # Compute monthly totals for each selected cell
     monthly_totals = {}
     for year, tag in selected_cells:
         monthly_totals[(year, tag)] = {"total": 0.0, "count": 0}
     
-    for tx in filtered:
-        date_str = tx.get("date", "")
-        try:
-            tx_year = int(date_str[:4])
-        except:
-            continue
-        tx_tag = int(tx.get("month_tag") or tx.get("tag"))
-        amount = abs(float(tx.get("debit") or tx.get("amount") or 0))
-        
-        key = (tx_year, tx_tag)
+    for tx, key, amount in converted:
         if key in monthly_totals:
             monthly_totals[key]["total"] += amount
             monthly_totals[key]["count"] += 1
@@ -568,11 +1998,10 @@ def api_statistics():
     if not categories_filter:
         # No category filter: group by category
         category_totals = {}
-        for tx in filtered:
+        for tx, _, amount in converted:
             cat = tx.get("category", "")
             if not cat:
                 continue
-            amount = abs(float(tx.get("debit") or tx.get("amount") or 0))
             if cat not in category_totals:
                 category_totals[cat] = 0.0
             category_totals[cat] += amount
@@ -589,11 +2018,10 @@ def api_statistics():
     elif len(categories_filter) == 1:
         # Single category: group by subcategory
         subcategory_totals = {}
-        for tx in filtered:
+        for tx, _, amount in converted:
             sub = tx.get("subcategory", "")
             if not sub:
                 continue
-            amount = abs(float(tx.get("debit") or tx.get("amount") or 0))
             if sub not in subcategory_totals:
                 subcategory_totals[sub] = 0.0
             subcategory_totals[sub] += amount
@@ -609,11 +2037,10 @@ def api_statistics():
     else:
         # Multiple categories: group by category
         category_totals = {}
-        for tx in filtered:
+        for tx, _, amount in converted:
             cat = tx.get("category", "")
             if not cat:
                 continue
-            amount = abs(float(tx.get("debit") or tx.get("amount") or 0))
             if cat not in category_totals:
                 category_totals[cat] = 0.0
             category_totals[cat] += amount
@@ -626,7 +2053,7 @@ def api_statistics():
                 "avg_per_month": round(total / num_months, 2) if num_months > 0 else 0
             })
     
-    return jsonify({
+    return {
         "months": months_array,
         "summary": {
             "total_over_period": round(total_over_period, 2),
@@ -635,8 +2062,53 @@ def api_statistics():
             "min_monthly": round(min_monthly, 2),
             "max_monthly": round(max_monthly, 2)
         },
-        "top_categories": top_categories
-    })
+        "top_categories": top_categories,
+        "currency": display,
+        "unconverted": unconverted
+    }
+
+@app.route("/api/statistics", methods=["POST"])
+def api_statistics():
+    """
+    New unified statistics endpoint.
+    Computes monthly statistics over selected (year, tag) cells.
+    
+    Expects JSON body:
+    {
+      "years": [2025, 2024, ...],
+      "tagsByYear": {"2025": [7,8,9], "2024": [10,11,12]},
+      "type": "Expense" | "Income",
+      "categories": ["אוכל", ...] (optional, empty = all),
+      "subcategories": ["קפה", ...] (optional, only if 1 category selected),
+      "quickFilter": "none" | "last3" | "last6" | "alltime" (optional),
+      "currency": "ILS" (optional, display currency; defaults to settings.currency)
+    }
+
+    Amounts in other currencies are converted with users/<name>/rates.csv;
+    rows with no usable rate (e.g. no rates.csv at all) are counted at face
+    value, and their number is returned in "unconverted".
+    
+    Returns:
+    {
+      "months": [{"year": 2025, "tag": 7, "total": 8536.60, "count": 45}, ...],
+      "summary": {
+        "total_over_period": 24643.87,
+        "avg_monthly": 8214.62,
+        "median_monthly": 7433.10,
+        "min_monthly": 3393.83,
+        "max_monthly": 12643.87
+      },
+      "top_categories": [
+        {"name": "אוכל", "total": 9000.0, "avg_per_month": 3000.0},
+        ...
+      ],
+      "currency": "ILS",
+      "unconverted": 0
+    }
+    """
+    user = _require_user()
+    p = _ensure_user_files(user)
+    return jsonify(_compute_statistics(user, p, request.get_json(force=True)))
 
 
 # Keep old endpoints for backward compatibility (deprecated)
@@ -661,7 +2133,7 @@ def api_statistics_summary():
         if not isinstance(tx, dict):
             continue
         
-        tx_tag = tx.get("month_tag") or tx.get("tag")
+        tx_tag = tx.get("month_tag")
         tx_year = tx.get("year")
         
         # Apply filters
@@ -678,7 +2150,7 @@ def api_statistics_summary():
         
         if tx_tag not in by_tag:
             by_tag[tx_tag] = []
-        by_tag[tx_tag].append(abs(float(tx.get("debit", 0))))
+        by_tag[tx_tag].append(_row_amount(tx))
     
     # Calculate means
     result = []
@@ -721,13 +2193,13 @@ def api_statistics_category_last3_mean():
         if tx.get("category") != category:
             continue
         
-        tx_tag = tx.get("month_tag") or tx.get("tag")
+        tx_tag = tx.get("month_tag")
         if not tx_tag:
             continue
         
         if tx_tag not in by_tag:
             by_tag[tx_tag] = []
-        by_tag[tx_tag].append(abs(float(tx.get("debit", 0))))
+        by_tag[tx_tag].append(_row_amount(tx))
     
     # Get last 3 months with data
     sorted_tags = sorted(by_tag.keys(), reverse=True)[:3]
@@ -764,7 +2236,7 @@ def api_statistics_income_means():
         if tx.get("type") != "Income":
             continue
         
-        tx_tag = tx.get("month_tag") or tx.get("tag")
+        tx_tag = tx.get("month_tag")
         tx_year = tx.get("year")
         
         if tags and tx_tag not in tags:
@@ -778,7 +2250,7 @@ def api_statistics_income_means():
         key = (cat, sub)
         if key not in by_cat_sub:
             by_cat_sub[key] = []
-        by_cat_sub[key].append(abs(float(tx.get("debit", 0))))
+        by_cat_sub[key].append(_row_amount(tx))
     
     # Calculate means
     result = []
@@ -819,7 +2291,7 @@ def api_statistics_rollup():
         if not isinstance(tx, dict):
             continue
         
-        tx_tag = tx.get("month_tag") or tx.get("tag")
+        tx_tag = tx.get("month_tag")
         tx_year = tx.get("year")
         tx_tx_type = tx.get("type", "Expense")
         
@@ -833,7 +2305,7 @@ def api_statistics_rollup():
         key = (tx_year, tx_tag)
         if key not in by_year_tag:
             by_year_tag[key] = []
-        by_year_tag[key].append(abs(float(tx.get("debit", 0))))
+        by_year_tag[key].append(_row_amount(tx))
     
     # Build result table
     result = []
@@ -858,6 +2330,19 @@ def _port() -> int:
     except Exception:
         return 5003
 
+def _waitress_options() -> Dict[str, int]:
+    """Waitress tuning from env: MONEYTRON_THREADS, MONEYTRON_CONNECTION_LIMIT, MONEYTRON_BACKLOG."""
+    opts = {}
+    for env, key in (("MONEYTRON_THREADS", "threads"),
+                     ("MONEYTRON_CONNECTION_LIMIT", "connection_limit"),
+                     ("MONEYTRON_BACKLOG", "backlog")):
+        try:
+            if os.environ.get(env):
+                opts[key] = int(os.environ[env])
+        except ValueError:
+            print(f"[MoneyTron] Ignoring {env}={os.environ[env]!r} (not an integer)")
+    return opts
+
 if __name__ == "__main__":
     port = _port()
     url = f"http://127.0.0.1:{port}/"
@@ -865,12 +2350,18 @@ if __name__ == "__main__":
     print(" MoneyTron backend is starting…")
     print(f" Open this in your browser: {url}")
     print("====================================================\n")
+    warmup = os.environ.get("MONEYTRON_WARMUP", "background").lower()
+    _start_warm_up(warmup)
+    print(f"[MoneyTron] Ready to serve after {(time.perf_counter() - _T0) * 1000:.0f} ms (warm-up: {warmup})")
     try:
         from waitress import serve
         print(f"[MoneyTron] Using Waitress WSGI server")
         print(f"[MoneyTron] Serving client from: {CLIENT_DIR}")
         print(f"[MoneyTron] Data dir: {USERS_DIR}")
-        serve(app, host="0.0.0.0", port=port)
+        opts = _waitress_options()
+        if opts:
+            print(f"[MoneyTron] Waitress options: {opts}")
+        serve(app, host="0.0.0.0", port=port, **opts)
     except Exception as e:
         print(f"[MoneyTron] Waitress unavailable ({e}); Flask dev server fallback")
         print(f"[MoneyTron] Serving client from: {CLIENT_DIR}")
@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="moneytron-test-")
+os.environ.setdefault("MONEYTRON_DATA_DIR", _TMP)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "server"))
+_cwd = os.getcwd()
+os.chdir(_TMP)                                        # moneytron.log path is fixed at import
+
+import new_app  # noqa: E402
+
+os.chdir(_cwd)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(new_app, "USERS_DIR", tmp_path.resolve())
+    return new_app.app.test_client()
+
+
+def seed_user(past, stage=()):
+    """Write a fresh user's ledger files directly (as an older version would have)."""
+    user = f"t{uuid.uuid4().hex[:8]}"
+    udir = new_app.USERS_DIR / user
+    udir.mkdir()
+    (udir / "past_data.json").write_text(json.dumps(past, ensure_ascii=False), encoding="utf-8")
+    (udir / "current_month_transactions.json").write_text(json.dumps(list(stage)), encoding="utf-8")
+    return user, udir
+
+
+def legacy_row(id_, date, year, tag, debit, name="wolt", category="Food", subcategory="wolt"):
+    """A row in the shape the client posts (and older files stored)."""
+    return {"id": id_, "date": date, "date_iso": date, "year": year, "tag": tag, "month_tag": tag,
+            "name": name, "amount": debit, "debit": debit, "currency": "ILS", "type": "Expense",
+            "category": category, "subcategory": subcategory}
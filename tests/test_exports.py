@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import legacy_row, seed_user
+
+
+def _login(client):
+    user, _ = seed_user([
+        legacy_row("a", "2025-01-05", 2025, 1, 50.0, name="wolt"),
+        dict(legacy_row("b", "2025-02-05", 2025, 2, 52.5, name="ארומה", category="אוכל", subcategory="קפה"),
+             notes="latte, large"),
+        dict(legacy_row("c", "2025-02-06", 2025, 2, 9000.0, name="Salary"), type="Income"),
+    ])
+    client.post("/api/login", json={"user": user})
+
+
+def _get(client, path, fmt, filters=None):
+    q = f"?format={fmt}" + (f"&filters={json.dumps(filters)}" if filters is not None else "")
+    return client.get(path + q)
+
+
+def test_past_data_csv(client):
+    _login(client)
+    r = _get(client, "/api/export/past-data", "csv", {"type": "Expense"})
+    assert r.status_code == 200 and "attachment" in r.headers["Content-Disposition"]
+    text = r.data.decode("utf-8")
+    assert text.startswith("\ufeff")
+    rows = list(csv.DictReader(io.StringIO(text[1:])))
+    assert [(x["id"], x["name"], x["debit"], x["year"], x["month_tag"]) for x in rows] == [
+        ("a", "wolt", "50.0", "2025", "1"), ("b", "ארומה", "52.5", "2025", "2")]
+    assert (rows[0]["notes"], rows[1]["notes"]) == ("", "latte, large")
+
+
+def test_past_data_xlsx_opens_in_openpyxl(client):
+    openpyxl = pytest.importorskip("openpyxl")
+    _login(client)
+    r = _get(client, "/api/export/past-data", "xlsx")
+    ws = openpyxl.load_workbook(io.BytesIO(r.data)).active
+    values = list(ws.values)
+    assert values[0][:3] == ("date", "name", "debit")
+    assert [(v[0], v[1], v[2]) for v in values[1:]] == [
+        ("2025-01-05", "wolt", 50), ("2025-02-05", "ארומה", 52.5), ("2025-02-06", "Salary", 9000)]
+
+
+def test_past_data_parquet_types(client):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _login(client)
+    table = pq.read_table(io.BytesIO(_get(client, "/api/export/past-data", "parquet").data))
+    assert (str(table.schema.field("year").type), str(table.schema.field("month_tag").type)) == ("int64", "int64")
+    assert str(table.schema.field("debit").type) == "double"
+    assert table.column("notes").to_pylist() == ["", "latte, large", ""]
+
+
+def test_statistics_csv_and_bad_month_selection(client):
+    _login(client)
+    sel = {"years": [2025], "tagsByYear": {"2025": [1, 2]}, "type": "Expense"}
+    rows = list(csv.reader(io.StringIO(_get(client, "/api/export/statistics", "csv", sel).data.decode("utf-8")[1:])))
+    assert rows == [["year", "tag", "total", "count", "currency"], ["2025", "1", "50.0", "1", "ILS"],
+                    ["2025", "2", "52.5", "1", "ILS"]]
+
+    assert _get(client, "/api/export/statistics", "csv", {"tagsByYear": {"2025": ["a"]}}).status_code == 400
+    assert _get(client, "/api/export/statistics", "csv", {"years": "2025"}).status_code == 400
+    assert _get(client, "/api/export/past-data", "pdf").status_code == 400
@@ -0,0 +1,77 @@
+import json
+
+import new_app
+from conftest import legacy_row, seed_user
+
+
+def _rows(n, start=0):
+    return [{"id": f"r{i}", "name": f"vendor {i}", "debit": float(i)} for i in range(start, start + n)]
+
+
+def test_list_documents_round_trip_through_deltas_and_full_rollover(tmp_path, monkeypatch):
+    monkeypatch.setattr(new_app, "_HISTORY_MAX_DEPTH", 4)
+    hdir = tmp_path / ".history"
+    versions = [_rows(50)]
+    for k in range(1, 10):
+        doc = [dict(r) for r in versions[-1]]
+        doc[k]["name"] = f"edited {k}"                     # change a row
+        del doc[-1]                                        # drop a row
+        doc += _rows(3, start=100 * k)                     # append rows
+        versions.append(doc)
+
+    hashes, parent = [], None
+    for doc in versions:
+        parent = new_app._history_store(hdir, doc, parent)
+        hashes.append(parent)
+
+    objs = [new_app._history_obj(hdir, h) for h in hashes]
+    assert [o["depth"] for o in objs] == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+    assert all("ops" in o for o in objs if o["depth"])
+    for doc, h in zip(versions, hashes):
+        assert new_app._history_load(hdir, h) == doc
+
+
+def test_restore_subset_of_documents(client):
+    user, udir = seed_user([legacy_row("a", "2025-01-05", 2025, 1, 50.0)])
+    client.post("/api/login", json={"user": user})
+    client.post("/api/categories", json={"categories": {"Food": ["wolt"]}})
+    snap = client.post("/api/history/snapshot").get_json()["id"]
+
+    client.post("/api/past-data", json={"past_data": []})
+    client.post("/api/categories", json={"categories": {"Home": ["rent"]}})
+
+    r = client.post("/api/history/restore", json={"id": snap, "docs": ["past"]})
+    assert r.get_json()["restored"] == ["past"]
+    assert [x["id"] for x in client.get("/api/past-data").get_json()["past_data"]] == ["a"]
+    assert json.loads((udir / "categories.json").read_text(encoding="utf-8")) == {"Home": ["rent"]}
+    assert client.post("/api/history/restore", json={"id": snap, "docs": ["rules"]}).status_code == 400
+
+
+def test_retention_and_gc_keep_every_base_a_kept_snapshot_needs(client, monkeypatch):
+    monkeypatch.setenv("MONEYTRON_SNAPSHOT_KEEP", "3")
+    monkeypatch.setenv("MONEYTRON_SNAPSHOT_DAYS", "0")
+    user, udir = seed_user([])
+    client.post("/api/login", json={"user": user})
+    p = new_app._paths(user)
+    hdir = new_app._history_dir(p)
+
+    past = []
+    for k in range(12):
+        past = past + [legacy_row(f"k{k}-{i}", "2025-01-05", 2025, 1, float(i)) for i in range(20)]
+        (udir / "past_data.json").write_text(json.dumps(past), encoding="utf-8")
+        (udir / "categories.json").write_text(json.dumps({"step": [str(k)]}), encoding="utf-8")
+        new_app._snapshot(user, p, f"step {k}")
+
+    log = json.loads((hdir / "log.json").read_text(encoding="utf-8"))
+    assert len(log) <= 4                                   # newest 3 + last of today
+    kept_docs = [e["docs"]["past"] for e in log]
+    assert any(new_app._history_obj(hdir, h).get("base") for h in kept_docs)
+    for e in log:
+        k = int(e["reason"].split()[1])
+        assert new_app._history_load(hdir, e["docs"]["past"]) == past[:20 * (k + 1)]
+    live = {h for e in log for h in e["docs"].values()}
+    for h in kept_docs:
+        while h:
+            live.add(h)
+            h = new_app._history_obj(hdir, h).get("base")
+    assert live == {f.stem for f in (hdir / "objects").glob("*.json")}   # needed bases kept, the rest collected
@@ -0,0 +1,44 @@
+from conftest import legacy_row, seed_user
+
+
+def _monthly(name, months, amount, day=5, year=2025, **kw):
+    return [legacy_row(f"{name}-{year}-{m}-{i}", f"{year}-{m:02d}-{day:02d}", year, m, a, name=name, **kw)
+            for i, (m, a) in enumerate(zip(months, amount if isinstance(amount, list) else [amount] * len(months)))]
+
+
+def _ledger():
+    rows = []
+    rows += _monthly("FreeTV", range(1, 7), [79.9, 79.9, 80.5, 79.9, 79.9, 79.9])   # ±2% is one charge
+    rows += _monthly("Insurance", [10], 300.0, year=2024) + _monthly("Insurance", [1, 4], 300.0)
+    rows += _monthly("Electric", range(1, 7), 200.0) + _monthly("Electric", [3], 1000.0, day=20)
+    rows += _monthly("Water", [2, 4, 6], 90.0)
+    rows += _monthly("Netflix", [1, 2, 3], 50.0)                                     # stopped in March
+    rows += [r for d in range(1, 25) for r in _monthly("Aroma", [1, 2, 3], 20.0, day=d)]  # daily coffee
+    rows += [dict(r, type="Income") for r in _monthly("Salary", range(1, 7), 10000.0)]
+    return rows
+
+
+def test_periods_and_amount_clusters(client):
+    user, _ = seed_user(_ledger())
+    client.post("/api/login", json={"user": user})
+
+    found = {r["vendor"]: r for r in client.get("/api/recurring").get_json()["recurring"]}
+    assert {k: found[k]["period_months"] for k in found} == {
+        "freetv": 1, "insurance": 3, "electric": 1, "water": 2, "netflix": 1, "salary": 1}
+    assert (found["freetv"]["amount"], found["freetv"]["amount_max"]) == (79.9, 80.5)
+    assert found["electric"]["amount"] == 200.0 and found["electric"]["occurrences"] == 6
+    assert not found["netflix"]["active"] and found["water"]["active"]
+
+
+def test_next_month_due_items(client):
+    user, _ = seed_user(_ledger())
+    client.post("/api/login", json={"user": user})
+
+    nxt = client.get("/api/recurring").get_json()["next_month"]
+    assert (nxt["year"], nxt["tag"]) == (2025, 7)
+    assert sorted(r["vendor"] for r in nxt["items"]) == ["electric", "freetv", "insurance", "salary"]
+    assert (nxt["expense"], nxt["income"]) == (579.9, 10000.0)
+
+    august = client.get("/api/recurring?year=2025&tag=8").get_json()["next_month"]
+    assert sorted(r["vendor"] for r in august["items"]) == ["electric", "freetv", "salary", "water"]
+    assert client.get("/api/recurring?tag=x").status_code == 400
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from conftest import legacy_row, seed_user
+
+
+def _apply(client, match, set_, dry_run=True):
+    return client.post("/api/rules/apply", json={"rules": [{"match": match, "set": set_}], "dry_run": dry_run})
+
+
+@pytest.mark.parametrize("match, set_", [
+    ({"name": "..."}, {"category": "X"}),                        # normalizes to ""
+    ({}, {"category": "X"}),                                     # no condition at all
+    ({"name": "wolt"}, {"category": {"x": 1}}),
+    ({"name": "wolt"}, {"subcategory": 5}),
+    ({"date_from": "01/02/2025"}, {"category": "X"}),
+    ({"date_to": "2025-02-31"}, {"category": "X"}),
+])
+def test_bad_rules_are_rejected(client, match, set_):
+    user, udir = seed_user([legacy_row("a", "2025-02-01", 2025, 2, 10.0)])
+    client.post("/api/login", json={"user": user})
+
+    assert _apply(client, match, set_, dry_run=False).status_code == 400
+    assert client.post("/api/rules", json={"rules": [{"match": match, "set": set_}]}).status_code == 400
+    [row] = json.loads((udir / "past_data.json").read_text(encoding="utf-8"))
+    assert row["category"] == "Food"
+
+
+def test_rule_matches_by_name_and_date_range(client):
+    user, udir = seed_user([
+        legacy_row("a", "2025-01-15", 2025, 1, 10.0, name="WOLT Tel Aviv"),
+        legacy_row("b", "2025-02-15", 2025, 2, 10.0, name="wolt"),
+        legacy_row("c", "2025-02-16", 2025, 2, 10.0, name="ארומה"),
+    ])
+    client.post("/api/login", json={"user": user})
+
+    r = _apply(client, {"name": "Wolt", "date_from": "2025-02-01"}, {"category": "Delivery"}, dry_run=False)
+    assert r.get_json()["changed"]["past"] == 1
+    rows = {x["id"]: x for x in json.loads((udir / "past_data.json").read_text(encoding="utf-8"))}
+    assert [rows[k]["category"] for k in "abc"] == ["Food", "Delivery", "Food"]
@@ -0,0 +1,49 @@
+import new_app
+from conftest import legacy_row, seed_user
+
+
+def _ids(resp):
+    return [r["row"]["id"] for r in resp.get_json()["results"]]
+
+
+def _login(client):
+    user, _ = seed_user([
+        legacy_row("w1", "2025-01-10", 2025, 1, 40.0, name="Wolt"),
+        legacy_row("w2", "2025-03-10", 2025, 3, 45.0, name="WOLT"),
+        legacy_row("wm", "2025-02-10", 2025, 2, 90.0, name="WoltMarket"),
+        legacy_row("v", "2025-02-11", 2025, 2, 12.0, name="Volt bikes"),
+        legacy_row("sd", "2025-01-12", 2025, 1, 300.0, name="Shufersal Deal"),
+        legacy_row("s", "2025-02-12", 2025, 2, 250.0, name="Shufersal"),
+        legacy_row("a", "2025-02-13", 2025, 2, 18.0, name='ארומה בע"מ'),
+    ])
+    client.post("/api/login", json={"user": user})
+
+
+def test_exact_then_prefix_then_fuzzy_newest_first(client):
+    _login(client)
+    r = client.get("/api/search?q=wolt")
+    assert _ids(r) == ["w2", "w1", "wm", "v"]
+    assert [x["score"] for x in r.get_json()["results"]] == [3.0, 3.0, 2.0, 1.0]
+    assert _ids(client.get("/api/search?q=wolt&prefix=0")) == ["w2", "w1", "v"]
+    assert _ids(client.get("/api/search?q=wolt&fuzzy=0")) == ["w2", "w1", "wm"]
+    assert _ids(client.get("/api/search?q=ארומ")) == ["a"]
+
+
+def test_scores_add_up_across_query_tokens(client):
+    _login(client)
+    assert _ids(client.get("/api/search?q=shufersal deal")) == ["sd", "s"]
+
+
+def test_pagination(client):
+    _login(client)
+    r = client.get("/api/search?q=wolt&per_page=3&page=2").get_json()
+    assert (r["total"], r["page"], r["per_page"]) == (4, 2, 3)
+    assert [x["row"]["id"] for x in r["results"]] == ["v"]
+    assert client.get("/api/search?q=wolt&page=9").get_json()["results"] == []
+    assert client.get("/api/search?q=wolt&page=x").status_code == 400
+
+
+def test_vendor_keys_drop_company_suffixes():
+    assert new_app._norm_vendor('ארומה בע"מ') == "ארומה"
+    assert new_app._norm_vendor("ח.פ. 5123 סופר") == "5123 סופר"
+    assert new_app._norm_vendor("Wolt Ltd.") == "wolt"
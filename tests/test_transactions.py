@@ -0,0 +1,132 @@
+import json
+import threading
+
+import new_app
+from conftest import legacy_row, seed_user
+
+
+def test_unreadable_stored_row_does_not_break_readers(client):
+    bad = legacy_row("bad", "2025-02-03", 2025, 2, "1,200.50")
+    user, udir = seed_user([
+        legacy_row("a", "2025-01-05", 2025, 1, 50.0),
+        legacy_row("b", "2025-02-05", 2025, 2, 52.0),
+        bad,
+    ], stage=[dict(bad, id="bad-stage")])
+    assert client.post("/api/login", json={"user": user}).status_code == 200
+
+    stats = client.post("/api/statistics", json={"years": [2025], "tagsByYear": {"2025": [1, 2]}, "type": "Expense"})
+    assert stats.status_code == 200
+    assert [m["total"] for m in stats.get_json()["months"]] == [50.0, 52.0]
+    assert client.post("/api/statistics/rollup", json={"years": [2025], "tags": [1, 2]}).status_code == 200
+    assert client.get("/api/budgets/status?year=2025&tag=2").status_code == 200
+    assert client.get("/api/recurring").status_code == 200
+    assert client.get("/api/search?q=wolt").status_code == 200
+
+    stored = {r["id"]: r for r in json.loads((udir / "past_data.json").read_text(encoding="utf-8"))}
+    assert stored["bad"]["_invalid"] == bad
+    assert (stored["bad"]["date"], stored["bad"]["year"], stored["bad"]["debit"]) == ("", None, 0.0)
+
+
+def test_migration_keeps_statement_year(client):
+    user, udir = seed_user([legacy_row("dec", "2024-12-28", 2025, 1, 80.0)])
+    assert client.post("/api/login", json={"user": user}).status_code == 200
+
+    [row] = json.loads((udir / "past_data.json").read_text(encoding="utf-8"))
+    assert (row["date"], row["year"], row["month_tag"]) == ("2024-12-28", 2025, 1)
+    assert client.get("/api/history").get_json()[0]["reason"] == "row format migration"
+
+
+def test_staging_autosave_keeps_half_typed_date(client):
+    user, udir = seed_user([])
+    client.post("/api/login", json={"user": user})
+    draft = dict(legacy_row("s1", "", 2025, 3, 10.0), date_str="12-0", date_iso="")
+
+    assert client.post("/api/current-month", json={"transactions": [draft]}).status_code == 200
+    [row] = client.get("/api/current-month").get_json()["current_month"]
+    assert (row["date"], row["date_str"]) == ("", "12-0")
+    assert client.post("/api/transactions", json={"transactions": [draft]}).status_code == 400
+
+
+def test_rejected_import_writes_nothing(client):
+    user, udir = seed_user([])
+    client.post("/api/login", json={"user": user})
+    before = (udir / "categories.json").read_text(encoding="utf-8")
+
+    r = client.post("/api/import", json={"categories": {"Food": ["wolt"]},
+                                         "past_data": [legacy_row("x", "31-02-2025", 2025, 2, 1.0)]})
+    assert r.status_code == 400
+    assert (udir / "categories.json").read_text(encoding="utf-8") == before
+
+
+def test_foreign_rows_count_at_face_value_without_rates(client):
+    usd = dict(legacy_row("u", "2025-02-07", 2025, 2, 10.0), currency="USD")
+    user, udir = seed_user([legacy_row("a", "2025-01-05", 2025, 1, 50.0), legacy_row("b", "2025-02-05", 2025, 2, 52.0), usd])
+    client.post("/api/login", json={"user": user})
+    (udir / "budgets.json").write_text(json.dumps({"Food": {"limit": 100}}), encoding="utf-8")
+
+    stats = client.post("/api/statistics", json={"years": [2025], "tagsByYear": {"2025": [1, 2]}, "type": "Expense"}).get_json()
+    assert [m["total"] for m in stats["months"]] == [50.0, 62.0]
+    assert stats["unconverted"] == 1
+    status = client.get("/api/budgets/status?year=2025&tag=2").get_json()
+    assert status["budgets"][0]["spent"] == 62.0
+    assert status["unconverted_currencies"] == ["USD"]
+
+
+def test_zero_debit_round_trips_unchanged(client):
+    row = dict(legacy_row("z", "2025-03-01", 2025, 3, 0), amount=50)
+    user, udir = seed_user([row])
+    client.post("/api/login", json={"user": user})
+
+    [stored] = json.loads((udir / "past_data.json").read_text(encoding="utf-8"))
+    assert (stored["debit"], stored["amount"]) == (0, 50)
+    assert client.post("/api/past-data", json={"past_data": [stored]}).status_code == 200
+    [saved] = client.get("/api/past-data").get_json()["past_data"]
+    assert (saved["debit"], saved["amount"]) == (0, 50)
+
+
+def test_legacy_staging_keeps_half_typed_date_on_upgrade(client):
+    user, udir = seed_user([], stage=[dict(legacy_row("s", "12-0", 2025, 4, 30.0), date_iso="")])
+    client.post("/api/login", json={"user": user})
+
+    [row] = client.get("/api/current-month").get_json()["current_month"]
+    assert (row["date_str"], row["debit"], row["category"], row["month_tag"]) == ("12-0", 30.0, "Food", 4)
+
+
+def test_non_finite_amounts_are_rejected(client):
+    user, udir = seed_user([])
+    client.post("/api/login", json={"user": user})
+    for bad in ("nan", "inf", "-Infinity"):
+        row = legacy_row("n", "2025-03-01", 2025, 3, bad)
+        assert client.post("/api/transactions", json={"transactions": [row]}).status_code == 400
+
+
+def test_concurrent_commits_keep_ledger_and_caches_in_step(client):
+    user, udir = seed_user([])
+    client.post("/api/login", json={"user": user})
+    (udir / "budgets.json").write_text(json.dumps({"Food": {"limit": 1000}}), encoding="utf-8")
+    client.get("/api/budgets/status?year=2025&tag=1")          # build the caches first
+    client.get("/api/search?q=wolt")
+
+    def commit(t):
+        c = new_app.app.test_client()
+        for i in range(20):
+            c.post("/api/transactions", json={"transactions": [legacy_row(f"{t}-{i}", "2025-01-10", 2025, 1, 1.0)]})
+
+    threads = [threading.Thread(target=commit, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(json.loads((udir / "past_data.json").read_text(encoding="utf-8"))) == 160
+    assert client.get("/api/budgets/status?year=2025&tag=1").get_json()["budgets"][0]["spent"] == 160.0
+    assert client.get("/api/search?q=wolt").get_json()["total"] == 160
+
+
+def test_budgets_use_the_statement_month(client):
+    user, udir = seed_user([legacy_row("dec", "2024-12-28", 2025, 1, 80.0)])
+    client.post("/api/login", json={"user": user})
+    (udir / "budgets.json").write_text(json.dumps({"Food": {"limit": 100}}), encoding="utf-8")
+
+    assert client.get("/api/budgets/status?year=2025&tag=1").get_json()["budgets"][0]["spent"] == 80.0
+    assert client.get("/api/budgets/status?year=2024&tag=1").get_json()["budgets"][0]["spent"] == 0.0